@@ -3,6 +3,7 @@ Copyright (c) 2020 Stichting imec Nederland (https://www.imec-int.com/en/imec-th
 @license GPL-3.0+ <http://spdx.org/licenses/GPL-3.0+>
 See COPYING, README.
 """
+import argparse
 import importlib
 import sys
 # NB: do not remove. PanTompkinsQRSDetector is used in one of the configuration files,
@@ -18,6 +19,7 @@ except Exception as e:
     str(e)
 
 from gui import PALMS
+from utils.utils_general import parse_time_window
 
 
 def reimport_all():
@@ -37,17 +39,25 @@ def reimport_all():
     importlib.reload(operation_mode)
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(prog='PALMS')
+    parser.add_argument('--time-window', type=parse_time_window, default=None, metavar='START-END',
+                        help='load only START-END seconds of each recording, e.g. 3600-7200, or 3600- until the end')
+    return parser.parse_known_args()[0]  # the rest is left to QApplication
+
+
 def main():
     """
-    if the app was closed with EXIT_CODE_REBOOT, then it was restarted
+    if the app was closed with EXIT_CODE_REBOOT, then it was restarted.
+    The time window of the closed session is kept for the next one, see File->Load Time Window
     """
 
-    file_to_load = None
+    file_to_load, time_window = None, parse_args().time_window
     exit_code = PALMS.EXIT_CODE_REBOOT
-    while exit_code in [PALMS.EXIT_CODE_REBOOT, PALMS.EXIT_CODE_LOAD_NEXT, PALMS.EXIT_CODE_LOAD_PREV]:
+    while exit_code in [PALMS.EXIT_CODE_REBOOT, PALMS.EXIT_CODE_LOAD_NEXT, PALMS.EXIT_CODE_LOAD_PREV, PALMS.EXIT_CODE_LOAD_WINDOW]:
         reimport_all()
-        app = PALMS(file_to_load)
-        exit_code, file_to_load = app.start()
+        app = PALMS(file_to_load, time_window=time_window)
+        exit_code, file_to_load, time_window = app.start()
         app._exit(exit_code)
     sys.exit(exit_code)
 
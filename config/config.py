@@ -25,7 +25,9 @@ default_config = {'panel_height'              : 300,
                   "show_cursor"               : False,
                   "show_xaxis_label"          : False,
                   "autoplay_timer_interval"   : 800,
-                  "default_mode"              : "annotation"}
+                  "default_mode"              : "annotation",
+                  "max_partition_items"       : 200,
+                  "max_undo_steps"            : 1000}
 
 
 # @formatter:on
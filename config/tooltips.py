@@ -11,6 +11,9 @@ restart_and_load_next = 'Restarts the app and automatically loads the next recor
 
 restart_and_load_prev = 'Restarts the app and automatically loads the prev recording'
 
+restart_and_load_window = 'Saves and reloads the current recording with only a time window of it, e.g. a few hours of a long recording.\r\n' \
+                          'The window is kept when loading the next or prev recording; an empty window loads whole recordings again'
+
 # Track menu
 remove_track = 'Delete currently selected view/track. The main track can not be deleted.\r\n' \
                'After deletion it is possible to recover the track by RightMouseClick in viewTable on the right\r\n' \
@@ -50,6 +53,10 @@ annotation_config = 'GUI dialog that allows to see and modify\r\n' \
                     'some of the annotation settings from the loaded %annotationConfig.csv% file'
 
 stickyFiducialMenu = 'Fix fiducial to avoid pressing keyboard button for each point'
+undo = 'Undo the last annotation, partition or epoch edit'
+redo = 'Redo the last undone edit'
+repinMenu = 'Move all annotations of the fiducial to its pinned_to peak or valley\r\n' \
+            'Annotations closer than min_distance to the previous one are removed'
 
 partition_config = 'Placeholder for possible GUI partition configuration dialog as annotationConfigDialog'
 
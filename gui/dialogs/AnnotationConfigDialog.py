@@ -70,6 +70,16 @@ class AnnotationConfigDialog(QtWidgets.QDialog):
                 items.append(p + ' ' + t)
         return items
 
+    def build_pinned_to_extrema(self, aConf):
+        """
+        builds peak or valley indices of the tracks fiducials are pinned to, so the first annotation after
+        switching pinned_to does not wait for it. Indices are cached in the tracks, switching back costs nothing
+        """
+        tracks = {v.track.label: v.track for p in self.application.viewer.model.panels for v in p.views}
+        for f in aConf.fiducials:
+            if f.is_pinned and f.pinned_to_track_label in tracks and hasattr(tracks[f.pinned_to_track_label], 'get_extrema'):
+                tracks[f.pinned_to_track_label].get_extrema(f.pinned_to_location)
+
     # not used
     def reset_pinned_to_options_to_existing_views(self):
         items = self.generate_pinned_to_choices_from_current_views()
@@ -109,6 +119,7 @@ class AnnotationConfigDialog(QtWidgets.QDialog):
         aConf.reset_fiducials_config(fiducials)
         self.table.clear()
         self.aConf_to_table(aConf)
+        self.build_pinned_to_extrema(aConf)
 
         # NB: recover aConf.pinned_to changes from json
         #  it is not needed as one can rewrite annotation config from AnnotationConfigDialog Save button
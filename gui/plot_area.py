@@ -22,8 +22,7 @@ from logic.operation_mode.annotation import AnnotationConfig
 from logic.operation_mode.epoch_mode import EpochModeConfig
 from logic.operation_mode.operation_mode import Modes, Mode
 from logic.operation_mode.partitioning import SinglePartition, Partitions
-from utils.QTimerWithPause import QTimerWithPause
-from utils.utils_general import find_closest
+from utils.RedrawScheduler import RedrawScheduler
 from utils.utils_gui import Dialog
 from .model import View
 
@@ -39,19 +38,12 @@ class PlotArea(pg.GraphicsView):
     signal_annotation_deleted = Signal(float, float, str, name='signal_annotation_deleted')
     last_keypress_event_key = None
 
-    wheelEventsCounter = 0
-
-    @classmethod
-    def reset_wheelEvents(cls):
-        cls.wheelEventsCounter = 0
-
-    # mouseWheelTimer.timeout.connect(PlotArea.reset_wheelEvents)
-
     def __init__(self, display_panel):
         from gui import PALMS
         super().__init__()
         self.display_panel = display_panel
         self.main_window = self.display_panel.main_window
+        self.redraw_scheduler = RedrawScheduler(self)  # redraws at most once per frame, whatever the rate of range changes
         # Layout
         self.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
         self.layout = pg.GraphicsLayout()
@@ -95,9 +87,6 @@ class PlotArea(pg.GraphicsView):
         self.signal_annotation_added.connect(self.plot_vline)
         self.signal_annotation_deleted.connect(self.plot_vline)
 
-        self.mouseWheelTimer = QTimerWithPause(interval=500)
-        self.mouseWheelTimer.timeout.connect(self.reset_wheelEvents)
-        self.mouseWheelTimer.resume()
         self.ALL_VIEWS_HIDDEN = False
 
     def buildLayout(self):
@@ -130,13 +119,6 @@ class PlotArea(pg.GraphicsView):
                     view.renderer.vb.setYRange(min=ymin, max=ymax, padding=0.1)
 
     def wheelEvent(self, event: QtGui.QWheelEvent):
-        # limit wheelevents to max N events in T seconds to avoid hanging GUI because of zooming in and out non-stop
-        PlotArea.wheelEventsCounter = PlotArea.wheelEventsCounter + 1
-        # print(PlotArea.wheelEventsCounter)
-        if PlotArea.wheelEventsCounter > 3:
-            qInfo('Zooming speed limited to optimize performance.')
-            return
-
         super().wheelEvent(event)
         newRange = self.main_vb.viewRange()[0]
         if self.main_window.selectedView is not None:
@@ -176,7 +158,7 @@ class PlotArea(pg.GraphicsView):
         if added_or_deleted not in ['added', 'deleted']:
             qWarning('Incorrect parameter to plot_vline')
             return
-        self.redraw_fiducials()
+        self.clear_temporary_items(self.selected_view().renderer.vb)
         if added_or_deleted == 'added':
             line = pg.InfiniteLine(pos=x, angle=90, movable=False)
         elif added_or_deleted == 'deleted':
@@ -233,9 +215,9 @@ class PlotArea(pg.GraphicsView):
             dist = np.inf
             fiducial_name, fiducial_idx = None, None
             for f_idx, f in enumerate(AnnotationConfig.get().fiducials):
-                if f.annotation.x.size > 0:
-                    closest_idx, _, _ = find_closest(f.annotation.x, np.array([click_x]))
-                    dist_new = abs(click_x - f.annotation.x[closest_idx])
+                closest_idx = f.annotation.nearest(click_x)
+                if closest_idx is not None:
+                    dist_new = abs(click_x - f.annotation.track().ts[closest_idx])
                     if dist_new < dist:
                         dist = dist_new
                         fiducial_name, fiducial_idx = f.name, f_idx
@@ -338,9 +320,8 @@ class PlotArea(pg.GraphicsView):
             if Partitions.find_partition_by_point(click_x) is not None:
                 qWarning('Choose different place or delete existing region')
             else:
-                p = SinglePartition.from_click(new_name, click_x=click_x)
-                vb.addItem(p)
-                vb.addItem(p.label)
+                SinglePartition.from_click(new_name, click_x=click_x)
+                Partitions.redraw()
         event.accept()
 
     @Slot(bool, name='Set Cursor Readout')
@@ -439,11 +420,8 @@ class PlotArea(pg.GraphicsView):
         if rangeReset:
             self.main_window.zoomFit()
 
-    # TODO: problem, this method is called after a view_to_remove.renderer has
-    # already changed in view_table.changeRenderer
-    # this should be refactored, so this method here can call
-    # view_to_remove.renderer.prepareToDelete() if such a method exists
     def removeView(self, view_to_remove: View):
+        view_to_remove.renderer.prepareToDelete()
         axis_to_remove = self.axes.pop(view_to_remove)
         vb_to_remove = self.vbs.pop(view_to_remove)
         assert isinstance(vb_to_remove, pg.ViewBox)
@@ -550,31 +528,74 @@ class PlotArea(pg.GraphicsView):
         main_view = all_views[main_track_idx]
         return main_view
 
+    @staticmethod
+    def clear_temporary_items(vb: pg.ViewBox):
+        for item in vb.temporary_items:
+            vb.removeItem(item)
+        vb.temporary_items.clear()
+
+    @staticmethod
+    def fiducials_shown(main_track) -> bool:
+        if Mode.mode not in [Modes.annotation, Modes.browse, Modes.partition, Modes.epoch]:  # NB: change to disable drawing annotations in other modes
+            return False
+        if Mode.mode == Modes.epoch and EpochModeConfig.get().toggle_fiducials == False:
+            return False  # if EpochMode and Fiducials are switched off
+        return hasattr(main_track, 'aConf')
+
+    @staticmethod
+    def fiducial_item(vb: pg.ViewBox, fiducial) -> pg.ScatterPlotItem:
+        """
+        persistent scatter item of the fiducial in the vb, created on first use or when the symbol config has changed.
+        Only its data is replaced when the plot is moved, the item itself stays in the scene
+        """
+        style = (fiducial.symbol, fiducial.symbol_size, fiducial.symbol_colour)
+        item = vb.fiducial_items.get(fiducial.name)
+        if item is None or item.style != style:
+            if item is not None:
+                vb.removeItem(item)
+            item = pg.ScatterPlotItem(symbol=fiducial.symbol, size=fiducial.symbol_size, pen=fiducial.symbol_pen, brush=(50, 50, 150),
+                                      name=fiducial.name)
+            item.style = style
+            vb.addItem(item)
+            vb.fiducial_items[fiducial.name] = item
+        return item
+
     def redraw_fiducials(self):
         if self.selected_view() is None:
             return
         main_view = PlotArea.get_main_view()
         if main_view is None:
             return
-        main_track = main_view.renderer.track
         vb = main_view.renderer.vb
+        self.clear_temporary_items(vb)
 
-        for item in vb.temporary_items:
-            vb.removeItem(item)
-        vb.temporary_items.clear()
+        fiducial_names = AnnotationConfig.all_fiducials()
+        for name in [n for n in vb.fiducial_items if n not in fiducial_names]:  # fiducials removed from the config
+            vb.removeItem(vb.fiducial_items.pop(name))
+        for a in AnnotationConfig.get():
+            self.refresh_fiducial(a.name)
+
+    def refresh_fiducial(self, fiducial_name: str):
+        """set data of the fiducial scatter item to the annotations within the current x-range"""
+        main_view = PlotArea.get_main_view()
+        if main_view is None:
+            return
+        item = self.fiducial_item(main_view.renderer.vb, AnnotationConfig.get()[fiducial_name])
+        if self.fiducials_shown(main_view.renderer.track):
+            x_min, x_max = self.main_vb.viewRange()[0]
+            points_x, points_y = AnnotationConfig.get()[fiducial_name].annotation.find_annotation_between_two_ts(x_min, x_max)
+            item.setData(x=points_x, y=points_y)
+        else:
+            item.clear()
+
+    def add_fiducial_point(self, fiducial_name: str, x: float, y: float):
+        """patch the fiducial scatter item with a just added annotation instead of redrawing all fiducials"""
+        main_view = PlotArea.get_main_view()
+        if main_view is None or not self.fiducials_shown(main_view.renderer.track):
+            return
         x_min, x_max = self.main_vb.viewRange()[0]
-        if Mode.mode in [Modes.annotation, Modes.browse, Modes.partition, Modes.epoch]:  # NB: change to disable drawing annotations in other modes
-            if Mode.mode == Modes.epoch and EpochModeConfig.get().toggle_fiducials == False:
-                return  # if EpochMode and Fiducials are switched off
-            if hasattr(main_track, 'aConf'):
-                aConf = AnnotationConfig.get()
-                for a in aConf:
-                    points_x, points_y = a.annotation.find_annotation_between_two_ts(x_min, x_max)
-                    if points_x.size > 0 and points_y.size > 0:
-                        loadedFiducials = pg.PlotDataItem(points_x, points_y, symbol=a.symbol, symbolSize=a.symbol_size, pen=None,
-                                                          symbolPen=a.symbol_pen, name=a.name)
-                        vb.addItem(loadedFiducials)
-                        vb.temporary_items.append(loadedFiducials)
+        if x_min < x < x_max:
+            self.fiducial_item(main_view.renderer.vb, AnnotationConfig.get()[fiducial_name]).addPoints(x=[x], y=[y])
 
     def zoomChanged(self):
         try:  # this is to avoid redrawing if it is already zoomed out to max
@@ -597,10 +618,11 @@ class PlotArea(pg.GraphicsView):
                 self.main_vb.setLimits(xMin=-pixel_width)
                 for vb in self.vbs.values():
                     vb.setLimits(xMin=-pixel_width)
-                self.redraw_fiducials()
+                self.redraw_scheduler.mark_dirty('fiducials', self.redraw_fiducials)
                 if self.display_panel is not None and len(self.display_panel.panel.views) > 0:
-                    self.setYRange()
-                EpochModeConfig.get().redraw_epochs()
+                    self.redraw_scheduler.mark_dirty('y-range', self.setYRange)
+                self.redraw_scheduler.mark_dirty('epochs', EpochModeConfig.get().redraw_epochs)
+                self.redraw_scheduler.mark_dirty('partitions', Partitions.redraw)
             except Exception as e:
                 Dialog().warningMessage('Exception occured\r\n'
                                         'Using more than one frame may have caused this!\r\n' +
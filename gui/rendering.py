@@ -13,6 +13,7 @@ import pyqtgraph as pg
 from qtpy import QtCore, QtGui
 
 from gui import tracking
+from utils.decimation import get_decimator, get_decimator_classes
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -120,6 +121,7 @@ class Renderer(metaclass=ABCMeta):  # MixIn
         self.vb.setXLink(self.plot_area.main_vb)
         self.plot_area.layout.addItem(self.vb, row=0, col=1)
         self.vb.temporary_items = []
+        self.vb.fiducial_items = {}  # fiducial name -> pg.ScatterPlotItem, see PlotArea.fiducial_item
 
     def render(self, plot_area) -> Tuple[pg.AxisItem, pg.ViewBox]:
         """generates pg.AxisItem and pg.ViewBox"""
@@ -146,6 +148,9 @@ class Renderer(metaclass=ABCMeta):  # MixIn
     def getDefaultYRange(self) -> Tuple[Union[int, float], Union[int, float]]:
         """returns the default y-bounds of this renderer"""
 
+    def prepareToDelete(self):
+        """disconnects from signals outside of the own plot items, called when the view is removed from its plot area"""
+
     def changePen(self):
         """changes the color/colormap of the plot"""
         self.setPen()
@@ -189,7 +194,10 @@ class Waveform(Renderer):
         if self.track.min and self.track.max:
             return self.track.min, self.track.max
         else:
-            return {np.dtype('int16'): (-32768, 32768), np.dtype('float'): (-1, 1)}[self.track.viewvalue.dtype]
+            dtype = self.track.viewvalue.dtype
+            if np.issubdtype(dtype, np.integer):
+                return np.iinfo(dtype).min, np.iinfo(dtype).max + 1
+            return -1, 1
 
     def reload(self):
         # TODO: waveform needs some kind of update scheme
@@ -199,11 +207,17 @@ class Waveform(Renderer):
         # TODO: look at parameters and modify things accordingly
         pass
 
+    def set_decimation(self, name: str):
+        """switch the decimation mode (see utils.decimation) of this view and redraw"""
+        self.decimator = get_decimator(name)
+        self.parameters['decimation'] = name
+        self.generatePlotData()
+
     def generateBlankPlotItems(self):
+        self.decimator = get_decimator(self.parameters.setdefault('decimation', get_decimator_classes()[0].name))
         self.item = pg.PlotDataItem()  # PlotCurveItem()
         self.item.setClipToView(True)
-        self.item.setDownsampling(ds=1, auto=False, method='subsample')  # TODO: set downsampling for plotting!!! PARAMETRIZE via GUI
-        # TODO: check https://stackoverflow.com/questions/30497997/using-pre-downsampled-data-when-plotting-large-time-series-in-pyqtgraph
+        self.item.setDownsampling(ds=1, auto=False, method='subsample')  # decimation is done by self.decimator
         self.item.setZValue(self.z_value)
         self.vb = pg.ViewBox()
         self.vb.addItem(self.item, ignoreBounds=True)
@@ -211,7 +225,7 @@ class Waveform(Renderer):
         self.configNewAxis()
         self.configNewViewBox()
         self.vb.setMouseEnabled(x=True, y=False)
-        self.vb.sigXRangeChanged.connect(self.generatePlotData, QtCore.Qt.DirectConnection)
+        self.vb.sigXRangeChanged.connect(lambda: self.plot_area.redraw_scheduler.mark_dirty(('waveform', self), self.generatePlotData))
 
     def generatePlotData(self):
         # don't bother computing if there is no screen geometry
@@ -223,32 +237,81 @@ class Waveform(Renderer):
         assert start >= 0
         if start > self.track.duration:
             return
-        stop = min([self.track.duration, int(ceil(x_max * self.track.fs)) + 1])
-        ds = int(round((stop - start) / self.vb.screenGeometry().width())) + 1
+        stop = int(min([self.track.duration, int(ceil(x_max * self.track.fs)) + 1]))
+        ds = (stop - start) / self.vb.screenGeometry().width()  # samples per pixel column
         if ds <= 0:
             logger.exception('ds should be > 0')
             return
 
-        if ds == 1:
-            visible = self.track.viewvalue[start:stop]
+        if ds < 2:
+            y = self.track.viewvalue[start:stop]
+            x = np.arange(start, start + len(y)) / self.track.fs
         else:
-            samples = 1 + ((stop - start) // ds)
-            visible = np.empty(samples * 2, dtype=self.track.viewvalue.dtype)
-            source_pointer = start
-            target_pointer = 0
-
-            chunk_size = int(round((1e6 // ds) * ds))
-            # assert isinstance(source_pointer, int)
-            # assert isinstance(chunk_size, int)
-            while source_pointer < stop - 1:
-                chunk = self.track.viewvalue[source_pointer:min([stop, source_pointer + chunk_size])]
-                source_pointer += len(chunk)
-                chunk = chunk[:(len(chunk) // ds) * ds].reshape(len(chunk) // ds, ds)
-                chunk_max = chunk.max(axis=1)
-                chunk_min = chunk.min(axis=1)
-                chunk_len = chunk.shape[0]
-                visible[target_pointer:target_pointer + chunk_len * 2:2] = chunk_min
-                visible[1 + target_pointer:1 + target_pointer + chunk_len * 2:2] = chunk_max
-                target_pointer += chunk_len * 2
-            visible = visible[:target_pointer]
-        self.item.setData(x=np.linspace(start, stop, num=len(visible), endpoint=True) / self.track.fs, y=visible, pen=self.view.color)
+            x, y = self.decimator.decimate(self.track, start, stop, ds)
+        self.item.setData(x=x, y=y, pen=self.view.color)
+
+
+class Interpolated(Renderer):
+    name = 'Interpolated'
+    accepts = [tracking.TimeValue, tracking.Intervals]
+    z_value = 10
+
+    def __init__(self, *args, **parameters):
+        super().__init__(*args, **parameters)
+        self.followed = None  # annotation whose edits an Intervals track follows, see follow_annotation
+
+    def getDefaultYRange(self) -> Tuple[float, float]:
+        return self.track.minY, self.track.maxY
+
+    def setLimits(self):
+        super().setLimits()
+        if isinstance(self.track, tracking.Intervals):  # intervals change with every edit of the annotation, so y is not bounded
+            self.vb.setLimits(yMin=None, yMax=None)
+
+    def reload(self):
+        pass
+
+    def perRendererParameterProcessing(self, parameters):
+        pass
+
+    def generateBlankPlotItems(self):
+        self.item = pg.PlotDataItem(connect='finite')
+        self.item.setZValue(self.z_value)
+        self.vb = pg.ViewBox()
+        self.vb.addItem(self.item, ignoreBounds=True)
+        self.ax = pg.AxisItem('left', showValues=False)  # ticks are disabled, because each view has separately created GridItem()
+        self.configNewAxis()
+        self.configNewViewBox()
+        self.vb.setMouseEnabled(x=True, y=False)
+        self.vb.sigXRangeChanged.connect(self.schedule_redraw)
+        self.follow_annotation(self.track.annotation if isinstance(self.track, tracking.Intervals) else None)
+
+    def prepareToDelete(self):
+        self.follow_annotation(None)
+
+    def follow_annotation(self, annotation):
+        """connects to the edits of annotation instead of the one followed so far, at most one connection per renderer"""
+        if self.followed is not None:
+            self.followed.signal_edited.disconnect(self.annotation_edited)
+        self.followed = annotation
+        if annotation is not None:
+            annotation.signal_edited.connect(self.annotation_edited)
+
+    def annotation_edited(self, kind: str, i: int):
+        self.track.annotation_edited(kind, i)
+        self.schedule_redraw()
+
+    def schedule_redraw(self, *args):
+        self.plot_area.redraw_scheduler.mark_dirty(('waveform', self), self.generatePlotData)
+
+    def generatePlotData(self):
+        """events in view are drawn as they are if there are fewer of them than pixels, otherwise interpolated once per pixel"""
+        width = int(self.vb.screenGeometry().width()) if self.vb.width() else 0
+        if not width:
+            return
+        x_min, x_max = self.vb.viewRange()[0]
+        x, y = self.track.events_between(x_min, x_max)
+        if x.size > width:
+            grid = np.linspace(x_min, x_max, width)
+            x, y = grid, np.interp(grid, x, y, left=np.nan, right=np.nan)
+        self.item.setData(x=x, y=y, pen=self.view.color, connect='finite')
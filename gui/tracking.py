@@ -4,15 +4,15 @@ MIT license (see in gui\LICENSE.txt)
 """
 
 import abc
-import bisect
 import datetime
 import logging
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
 import numpy as np
 from pyqtgraph import downsample
 
+from utils.signal_index import ChunkedArray, ExtremaIndex, MinMaxPyramid, TimeAxis
 from utils.utils_gui import Dialog
 
 logger = logging.getLogger()
@@ -98,19 +98,32 @@ def get_track_classes() -> List[Track]:
     return [obj for obj in all_subclasses(Track)]
 
 
+def add_yrange_margin(vmin: float, vmax: float) -> Tuple[float, float]:
+    """widens [vmin, vmax] by PALMS.config['yrange_margin'] of each bound"""
+    from gui import PALMS
+    yrange_margin = PALMS.config['yrange_margin']
+    return (vmin * (1 + yrange_margin) if vmin < 0 else vmin * (1 - yrange_margin),
+            vmax * (1 - yrange_margin) if vmax < 0 else vmax * (1 + yrange_margin))
+
+
 class Wave(Track):
 
-    def __init__(self, y: np.ndarray, fs, ts=None, duration=None, offset=0, label=None, unit='au', filename=None):
+    def __init__(self, y: np.ndarray, fs, ts=None, duration=None, offset=0, label=None, unit='au', filename=None, dtype=float):
+        """
+        y is stored as is when it already has the requested dtype (e.g. a read-only np.memmap, see from_npy and from_hdf5),
+        otherwise it is converted once. dtype=np.float32 halves the memory of a track, dtype=None keeps the dtype of y.
+        y may also be a ChunkedArray, then samples stay on disk and are read (and converted) only when they are needed
+        """
         super().__init__(label)
-        assert isinstance(y, np.ndarray)
+        assert isinstance(y, (np.ndarray, ChunkedArray))
         assert 1 <= y.ndim, "only a single channel is supported"
         assert isinstance(fs, int)
         assert fs > 0
-        self._value = y.astype(float)
+        self._value = y if dtype is None or y.dtype == np.dtype(dtype) else y.astype(dtype)
         self._fs = fs
         self._offset = offset  # this is required to support heterogenous fs in multitracks
         self.type = 'Wave'
-        self.ts = ts if ts is not None else np.linspace(0, stop=(len(self._value) - 1) / fs, num=len(self._value)) + self._offset
+        self.ts = ts if ts is not None else TimeAxis(len(self._value), fs, self._offset)  # explicit ts only for irregular sampling
 
         self.filename = self.label + datetime.datetime.now().strftime("%Y%m%d-%H%M%S") if filename is None else filename
         if not duration:
@@ -118,19 +131,46 @@ class Wave(Track):
         assert len(self._value) <= duration < len(
             self._value) + 1, "Cannot set duration of a wave to other than a number in [length, length+1) - where length = len(self.y)"
         self._duration = duration
-        from gui import PALMS
-        yrange_margin = PALMS.config['yrange_margin']
-        self.minY = np.min(self._value) * (1 + yrange_margin) if np.min(self._value) < 0 else np.min(self._value) * (1 - yrange_margin)
-        self.maxY = np.max(self._value) * (1 - yrange_margin) if np.max(self._value) < 0 else np.max(self._value) * (1 + yrange_margin)
-        self.minX = np.min(self.ts)
-        self.maxX = np.max(self.ts)
-
         self.unit = unit
 
-        self._viewvalue = self._value.copy()
+        # construction is O(1), everything below is computed on first use
+        self._viewvalue = None  # None while the viewvalue is the value itself, i.e. until a filter sets its own viewvalue
+        self._lod = None  # min/max pyramid of the viewvalue
+        self._value_lod = None  # same for the value, used by get_yrange_between
+        self._extrema = {}  # 'peak'/'valley' -> ExtremaIndex of the value, used to pin annotations
+        self._yrange = None  # (minY, maxY) of the value
+
+    @classmethod
+    def from_npy(cls, path, fs, mmap_mode='r', **kwargs):
+        """wave backed by a memory-mapped .npy file: samples are read from disk when they are plotted or analyzed"""
+        kwargs.setdefault('dtype', None)
+        y = np.load(Path(path), mmap_mode=mmap_mode)
+        return cls(y.reshape(-1), fs, **kwargs)
+
+    @classmethod
+    def from_hdf5(cls, dataset, fs, **kwargs):
+        """
+        wave backed by an h5py.Dataset (e.g. f['/data/ecg/signal'] of a -v7.3 mat file). Contiguous uncompressed datasets
+        are memory-mapped, chunked or compressed ones are read slice by slice through a ChunkedArray
+        """
+        kwargs.setdefault('dtype', None)
+        offset = dataset.id.get_offset()
+        if offset is None or dataset.chunks is not None or dataset.compression is not None:
+            return cls(ChunkedArray(dataset), fs, **kwargs)  # the file must stay open while the wave is used
+        y = np.memmap(dataset.file.filename, dtype=dataset.dtype, mode='r', offset=offset, shape=dataset.shape)
+        assert sum(d > 1 for d in y.shape) <= 1, "only a single channel is supported"
+        return cls(y.reshape(-1), fs, **kwargs)
 
     def invert(self):
-        self._value = -self._value
+        self._value = np.negative(self.value)  # an out-of-core value is read into memory
+        self._value_changed()
+
+    def _value_changed(self):
+        if self._viewvalue is None:
+            self._lod = None
+        self._value_lod = None
+        self._extrema = {}
+        self._yrange = None
 
     def derive_1der(self):
         return Derived(self, '1der')
@@ -164,71 +204,275 @@ class Wave(Track):
         assert isinstance(value, np.ndarray)
         assert 1 == value.ndim, 'only a single channel is supported'
         self._value = value
+        self._value_changed()
         if not (len(self._value) <= self._duration < len(self._value) + 1):
             self._duration = len(self._value)
 
     value = property(get_value, set_value)
 
     def get_viewvalue(self):
-        return self._viewvalue
+        return self.value if self._viewvalue is None else self._viewvalue
 
     def set_viewvalue(self, viewvalue):
         assert isinstance(viewvalue, np.ndarray)
         assert 1 == viewvalue.ndim, 'only a single channel is supported'
         self._viewvalue = viewvalue
+        self._lod = None
+        self._extrema = {}
         if not (len(self._viewvalue) <= self._duration < len(self._viewvalue) + 1):
             self._duration = len(self._viewvalue)
 
     def reset_viewvalue(self):
-        self._viewvalue = self._value
+        self._viewvalue = None
+        self._lod = None
+        self._extrema = {}
 
     viewvalue = property(get_viewvalue, set_viewvalue)
 
+    def get_lod(self):
+        """level-of-detail min/max pyramid of the viewvalue, rebuilt after viewvalue has changed"""
+        if self._lod is None:
+            self._lod = MinMaxPyramid(self.viewvalue)
+        return self._lod
+
+    lod = property(get_lod)
+
+    def get_value_lod(self):
+        """min/max pyramid of the value, shared with lod while the viewvalue is the value itself"""
+        if self._viewvalue is None:
+            return self.lod
+        if self._value_lod is None:
+            self._value_lod = MinMaxPyramid(self.value)
+        return self._value_lod
+
+    value_lod = property(get_value_lod)
+
+    def get_extrema(self, location: str) -> ExtremaIndex:
+        """index of the peaks or valleys of the value, built on first use for each location"""
+        location = 'valley' if 'valley' in location.lower() else 'peak'
+        if location not in self._extrema:
+            self._extrema[location] = ExtremaIndex(self.value, valley=location == 'valley')
+        return self._extrema[location]
+
+    def get_yrange(self) -> Tuple[float, float]:
+        """min and max of the value with the yrange_margin, taken from the min/max pyramid which is needed for plotting anyway"""
+        if self._yrange is None:
+            self._yrange = add_yrange_margin(*self.value_lod.range_minmax(0, len(self.ts)))
+        return self._yrange
+
+    minY = property(lambda self: self.get_yrange()[0])
+    maxY = property(lambda self: self.get_yrange()[1])
+    minX = property(lambda self: self.ts[0])  # ts is sorted
+    maxX = property(lambda self: self.ts[-1])
+
     def get_duration(self):
         return self._duration
 
     def set_duration(self, duration):
-        assert len(self._value) <= duration < len(
-            self._value) + 1, "Cannot set duration of a wave to other than a number in [length, length+1) - where length = len(self.value)"
+        assert len(self.ts) <= duration < len(
+            self.ts) + 1, "Cannot set duration of a wave to other than a number in [length, length+1) - where length = len(self.value)"
         self._duration = duration
 
     duration = property(get_duration, set_duration)
 
+    def find_nearest_sample(self, x):
+        """
+        index of the sample closest in time to x (the earlier one on a tie), as find_closest(ts, [x]) but in O(1),
+        or O(log n) for an explicit ts. x may also be an array, then an array of indices is returned
+        """
+        if isinstance(self.ts, TimeAxis):
+            return self.ts.nearest(x)
+        if len(self.ts) == 1:
+            return 0 if np.ndim(x) == 0 else np.zeros(np.shape(x), dtype=int)
+        i = np.clip(np.searchsorted(self.ts, x), 1, len(self.ts) - 1)
+        i = i - (x - self.ts[i - 1] <= self.ts[i] - x)
+        return int(i) if np.ndim(i) == 0 else i
+
     def get_yrange_between(self, xmin, xmax):
-        ymin, ymax = 0, 1
-        sig = self._value
-        ts = self.ts
-
-        # import time
-        # s = time.time()
-        # for i in np.arange(100000):
-        #     idx = np.arange(np.searchsorted(ts, xmin, 'right'), np.searchsorted(ts, xmax, 'left'))
-        idx = np.arange(bisect.bisect_right(ts, xmin), bisect.bisect_left(ts, xmax))
-        # en = time.time() - s
-
-        if any(idx):
-            sig = sig[idx]
-            ymin, ymax = np.min(sig), np.max(sig)
-        return ymin, ymax
+        """min and max of the value strictly between xmin and xmax, (0, 1) if there are no samples in between"""
+        start, stop = np.searchsorted(self.ts, xmin, 'right'), np.searchsorted(self.ts, xmax, 'left')
+        if start >= stop:
+            return 0, 1
+        return self.value_lod.range_minmax(start, stop)
 
     def get_dtype(self):
-        return self._value.dtype
+        return self.value.dtype
 
     dtype = property(get_dtype)
 
 
 class Derived(Wave):
+    """derivative of a wave, np.gradient over the full signal is computed on first use of the value"""
+
     def __init__(self, wave: Wave, type: str):
         if type in ['d', 'd1', 'derivative', '1derivative', 'derivative1', 'der1', '1der']:
-            y = np.gradient(wave.value)
+            self._order = 1
             label = 'd_' + wave.label
             unit = 'd_' + wave.unit
         elif type in ['d2', 'derivative2', '2derivative', 'der2', '2der']:
-            y = np.gradient(np.gradient(wave.value))
+            self._order = 2
             label = 'd2_' + wave.label
             unit = 'd2_' + wave.unit
         else:
             raise ValueError
 
-        super().__init__(y, wave.fs, wave.ts, offset=wave.offset, label=label, unit=unit)
+        # Wave only checks the size of y, a zero-strided placeholder avoids reading (or deriving, if wave is Derived) the source
+        placeholder = np.broadcast_to(np.zeros(1), (int(wave.duration),))
+        super().__init__(placeholder, wave.fs, wave.ts, offset=wave.offset, label=label, unit=unit, dtype=None)
         self.type = 'Derived'
+        self._source = wave
+        self._value = None
+
+    def get_value(self):
+        if self._value is None:
+            y = self._source.value
+            for _ in range(self._order):
+                y = np.gradient(y)
+            self._value = y
+        return self._value
+
+    value = property(get_value, Wave.set_value)
+
+
+class TimeValue(Track):
+    """
+    Values at irregular times, e.g. one RR interval per beat. Only the events are stored, renderers interpolate between them,
+    so a tachogram of a 24-hour recording takes ~1 MB instead of a full-length array at the sampling rate of the main track
+    """
+
+    def __init__(self, time: np.ndarray, value: np.ndarray, fs: int, duration: int, label=None, unit='au'):
+        super().__init__(label)
+        assert isinstance(time, np.ndarray) and isinstance(value, np.ndarray)
+        assert time.shape == value.shape and time.ndim == 1, 'time and value should be 1D arrays of the same size'
+        assert isinstance(fs, int)
+        assert fs > 0
+        self._time = time
+        self._value = value.astype(float)
+        self._fs = fs  # only defines the time grid of the track (duration, zooming limits), not a sampling rate of the values
+        self._duration = duration
+        self.type = 'TimeValue'
+        self.unit = unit
+        self.minX = 0
+        self.maxX = duration / fs
+
+    def get_time(self):
+        return self._time
+
+    def set_time(self, time):
+        raise Exception("can't set times for TimeValue")
+
+    time = property(get_time, set_time)
+    ts = time
+
+    def get_value(self):
+        return self._value
+
+    def set_value(self, value):
+        raise Exception("can't set values for TimeValue")
+
+    value = property(get_value, set_value)
+
+    def get_viewvalue(self):
+        return self._value
+
+    viewvalue = property(get_viewvalue)
+
+    def get_duration(self):
+        return self._duration
+
+    duration = property(get_duration)
+
+    def events_between(self, xmin, xmax):
+        """times and values of the events between xmin and xmax, plus the nearest event on each side to draw lines to"""
+        time, value = self.time, self.value
+        start, stop = np.searchsorted(time, xmin, 'left'), np.searchsorted(time, xmax, 'right')
+        return time[max(start - 1, 0):stop + 1], value[max(start - 1, 0):stop + 1]
+
+    def get_yrange_between(self, xmin, xmax):
+        """min and max of the interpolated value between xmin and xmax, (0, 1) if there are no events around"""
+        _, value = self.events_between(xmin, xmax)
+        if value.size == 0:
+            return 0, 1
+        return np.min(value), np.max(value)
+
+    def get_yrange(self) -> Tuple[float, float]:
+        """min and max of the current values with the yrange_margin, so that Intervals follow the edits of the annotation"""
+        value = self.value
+        return add_yrange_margin(*((np.min(value), np.max(value)) if value.size else (0, 1)))
+
+    minY = property(lambda self: self.get_yrange()[0])
+    maxY = property(lambda self: self.get_yrange()[1])
+
+
+class Intervals(TimeValue):
+    """
+    Intervals between consecutive annotations (e.g. RR), or the rate 60 / interval (HR) if as_rate.
+    Nothing is stored: events are derived from the annotation when drawn, so the track follows every add or delete of
+    an annotation at the cost of the few beats in view, independent of the number of annotations
+    """
+
+    def __init__(self, annotation, fs: int, duration: int, as_rate: bool = False, label=None, unit='au'):
+        self.annotation = annotation
+        self.as_rate = as_rate
+        self._cache = (None, None, None)  # (x, time, value) the intervals were computed for
+        super().__init__(*self._events()[1:], fs, duration, label=label, unit=unit)
+        self._yrange = None  # running (min, max) of the values, see annotation_edited
+
+    def _intervals(self, x: np.ndarray):
+        interval = np.diff(x)
+        return x[1:], 60 / interval if self.as_rate else interval
+
+    def _events(self):
+        """all intervals of the annotation, only computed when a full array is requested, e.g. on export"""
+        x = self.annotation.x  # the same object is returned until the next edit
+        if self._cache[0] is not x:
+            self._cache = (x, *self._intervals(x))
+        return self._cache
+
+    def get_time(self):
+        return self._events()[1]
+
+    time = property(get_time, TimeValue.set_time)
+    ts = time
+
+    def get_value(self):
+        return self._events()[2]
+
+    value = property(get_value, TimeValue.set_value)
+    viewvalue = property(get_value)
+
+    def annotation_edited(self, kind: str, i: int):
+        """
+        follows Annotation.signal_edited: the intervals around the added or deleted sample index i widen the running y-range,
+        which costs two bisections of the annotation store. A deletion could also narrow the range, it is then kept wider until
+        the next 'reset', which recomputes the range from all intervals. Applying the same edit twice changes nothing
+        """
+        if kind == 'reset' or self._yrange is None:
+            self._yrange = None
+            return
+        ts, store = self.annotation.track().ts, self.annotation.store
+        prev, nxt = store.neighbours(i - 1)  # after an add nxt is i itself
+        beats = [prev, nxt, store.neighbours(i)[1]] if kind == 'added' else [prev, nxt]
+        beats = [b for b in beats if b is not None]
+        if len(beats) < 2:
+            return
+        _, value = self._intervals(ts[np.array(beats, dtype=np.int64)])
+        self._yrange = (min(self._yrange[0], np.min(value)), max(self._yrange[1], np.max(value)))
+
+    def get_yrange(self) -> Tuple[float, float]:
+        if self._yrange is None:
+            value = self.value
+            self._yrange = (np.min(value), np.max(value)) if value.size else (0, 1)
+        return add_yrange_margin(*self._yrange)
+
+    def events_between(self, xmin, xmax):
+        ts, store = self.annotation.track().ts, self.annotation.store
+        start, stop = np.searchsorted(ts, xmin, 'left'), np.searchsorted(ts, xmax, 'right')
+        before, _ = store.neighbours(start - 1)  # the interval ending at the first event before the view needs one more beat
+        before = [i for i in (store.neighbours(before - 1)[0] if before is not None else None, before) if i is not None]
+        inside = store.between(start, stop)
+        _, after = store.neighbours(stop - 1)
+        after = [i for i in (after, store.neighbours(after)[1] if after is not None and not before and not inside.size else None)
+                 if i is not None]  # without beats before, the interval after the view needs two beats after it
+        idx = np.r_[before, inside, after].astype(np.int64)
+        return self._intervals(ts[idx])
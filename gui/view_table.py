@@ -14,8 +14,10 @@ from qtpy import QtCore, QtGui, QtWidgets
 from qtpy.QtCore import Slot, Signal
 
 from logic.databases.DatabaseHandler import Database
+from utils.decimation import get_decimator_classes
 from utils.utils_gui import Dialog
 from .model import Panel, View
+from .rendering import Waveform
 
 logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)
@@ -297,8 +299,6 @@ class ViewTable(QtWidgets.QTableWidget):
         link_menu = menu.addMenu("&Link Track")
         copy_menu = menu.addMenu("Copy View")
 
-        derive_menu = menu.addMenu("Add derived tracks")
-
         linkAction = QtWidgets.QAction('Create Link in this Panel', self)
         linkAction.triggered.connect(partial(self.display_panel.linkTrack, view, self.main_window.model.panels.index(self.panel)))
         link_menu.addAction(linkAction)
@@ -311,16 +311,26 @@ class ViewTable(QtWidgets.QTableWidget):
         copy_menu.addSeparator()
         copy_menu.setEnabled(False)
 
-        addDerivativeAction = QtWidgets.QAction('1st derivative', self)
-        addDerivativeAction.triggered.connect(
-            partial(self.display_panel.addDerivative, view, self.main_window.model.panels.index(self.panel), 1))
-        # TODO: derivative filters GUI
-        derive_menu.addAction(addDerivativeAction)
+        if isinstance(view.renderer, Waveform):  # only waves can be derived, TimeValue tracks (RR/HR) have no derivatives
+            derive_menu = menu.addMenu("Add derived tracks")
+
+            addDerivativeAction = QtWidgets.QAction('1st derivative', self)
+            addDerivativeAction.triggered.connect(
+                partial(self.display_panel.addDerivative, view, self.main_window.model.panels.index(self.panel), 1))
+            # TODO: derivative filters GUI
+            derive_menu.addAction(addDerivativeAction)
+
+            addDerivativeAction = QtWidgets.QAction('2nd derivative', self)
+            addDerivativeAction.triggered.connect(
+                partial(self.display_panel.addDerivative, view, self.main_window.model.panels.index(self.panel), 2))
+            derive_menu.addAction(addDerivativeAction)
 
-        addDerivativeAction = QtWidgets.QAction('2nd derivative', self)
-        addDerivativeAction.triggered.connect(
-            partial(self.display_panel.addDerivative, view, self.main_window.model.panels.index(self.panel), 2))
-        derive_menu.addAction(addDerivativeAction)
+            decimation_menu = menu.addMenu('Decimation')
+            for decimator in get_decimator_classes():
+                action = QtWidgets.QAction(decimator.name, self, checkable=True)
+                action.setChecked(view.renderer.parameters.get('decimation') == decimator.name)
+                action.triggered.connect(partial(view.renderer.set_decimation, decimator.name))
+                decimation_menu.addAction(action)
 
         menu.addSeparator()
 
@@ -330,7 +340,7 @@ class ViewTable(QtWidgets.QTableWidget):
             RRintervalMenu_actions = []
             for f in AnnotationConfig.all_fiducials():
                 f_idx = AnnotationConfig.get().find_idx_by_name(f)
-                if AnnotationConfig.get().fiducials[f_idx].annotation.x.size > 2:
+                if len(AnnotationConfig.get().fiducials[f_idx].annotation.store) > 2:
                     action = QtWidgets.QAction(f, self, checkable=False, enabled=True)
                     action.triggered.connect(partial(self.main_window.application.add_view_from_track,
                                                      AnnotationConfig.get().fiducials[f_idx].annotation.create_RRinterval_track(),
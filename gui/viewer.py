@@ -32,8 +32,9 @@ from PyQt5.QtCore import qInfo, qDebug
 from .display_panel import DisplayPanel, Frame
 from .model import Model, View, Panel
 from .view_table import ViewTable
-from utils.utils_general import get_project_root, resource_path
+from utils.utils_general import get_project_root, resource_path, parse_time_window
 from utils.utils_gui import Dialog
+from logic.operation_mode.edit_journal import EditJournal
 from logic.operation_mode.operation_mode import Modes, Mode
 from logic.operation_mode.partitioning import Partitions
 from logic.operation_mode.epoch_mode import EpochWindow, EpochModeConfig
@@ -243,6 +244,11 @@ class Viewer(QtWidgets.QMainWindow):
         self.file_menu.load_prev_action.setShortcuts(PALMS.shortcuts['restart_and_load_prev'])
         self.file_menu.addAction(self.file_menu.load_prev_action)
 
+        self.file_menu.load_window_action = QtWidgets.QAction('Load &Time Window...', self, enabled=True)
+        self.file_menu.load_window_action.setToolTip(tooltips.restart_and_load_window)
+        self.file_menu.load_window_action.triggered.connect(self.restart_and_load_window)
+        self.file_menu.addAction(self.file_menu.load_window_action)
+
         self.file_menu.exit_action = QtWidgets.QAction('&Exit', self)
         self.file_menu.exit_action.triggered.connect(QtWidgets.qApp.quit)
         self.file_menu.exit_action.setShortcut(QtGui.QKeySequence.Quit)
@@ -422,6 +428,15 @@ class Viewer(QtWidgets.QMainWindow):
         self.sticky_fiducial_popup_shortcut = QtWidgets.QShortcut(PALMS.shortcuts['sticky_fiducials_popup'], self)
         self.sticky_fiducial_popup_shortcut.activated.connect(self.raise_sticky_fiducial_popup)
 
+        self.annotation_menu.repin_menu = QtWidgets.QMenu('Re-pin')
+        self.annotation_menu.repin_menu.setToolTipsVisible(True)
+        for f in AnnotationConfig.all_fiducials():
+            action = QtWidgets.QAction(f, self, checkable=False, enabled=True)
+            action.setToolTip(tooltips.repinMenu)
+            action.triggered.connect(partial(self.repin_fiducial, f))
+            self.annotation_menu.repin_menu.addAction(action)
+        self.annotation_menu.addMenu(self.annotation_menu.repin_menu)
+
         self.annotation_menu.addSection('Partitions')
         self.annotation_menu.partitionConfig_action = QtWidgets.QAction('Config', self, checkable=False, enabled=False)
         self.annotation_menu.partitionConfig_action.setToolTip(tooltips.partition_config)
@@ -429,6 +444,19 @@ class Viewer(QtWidgets.QMainWindow):
         self.annotation_menu.partitionConfig_action.triggered.connect(lambda: Dialog().warningMessage('NotImplemented'))
         self.annotation_menu.addAction(self.annotation_menu.partitionConfig_action)
 
+        self.annotation_menu.addSeparator()
+        self.annotation_menu.undo_action = QtWidgets.QAction('Undo', self)
+        self.annotation_menu.undo_action.setToolTip(tooltips.undo)
+        self.annotation_menu.undo_action.setShortcut(PALMS.shortcuts['undo'])
+        self.annotation_menu.undo_action.triggered.connect(partial(self.undo_redo, EditJournal.undo))
+        self.annotation_menu.addAction(self.annotation_menu.undo_action)
+
+        self.annotation_menu.redo_action = QtWidgets.QAction('Redo', self)
+        self.annotation_menu.redo_action.setToolTip(tooltips.redo)
+        self.annotation_menu.redo_action.setShortcut(PALMS.shortcuts['redo'])
+        self.annotation_menu.redo_action.triggered.connect(partial(self.undo_redo, EditJournal.redo))
+        self.annotation_menu.addAction(self.annotation_menu.redo_action)
+
         self.annotation_menu.addSeparator()
         self.annotation_menu.annotationSave_action = QtWidgets.QAction('Save', self)
         self.annotation_menu.annotationSave_action.setToolTip(tooltips.annotationSave)
@@ -565,6 +593,32 @@ class Viewer(QtWidgets.QMainWindow):
         elif next_or_prev in ['P', 'p', 'prev', 'PREV', 'Prev']:
             QtGui.QGuiApplication.exit(PALMS.EXIT_CODE_LOAD_PREV)
 
+    def restart_and_load_window(self):
+        current = PALMS.TIME_WINDOW
+        text = '' if current is None else '{:g}-{}'.format(current[0], '' if current[1] is None else '{:g}'.format(current[1]))
+        text, accepted = QtWidgets.QInputDialog.getText(self, 'Load Time Window',
+                                                        'start-end in seconds, e.g. 3600-7200 or 3600- until the end\r\n'
+                                                        'leave empty to load the whole recording', text=text)
+        if not accepted:
+            return
+        try:
+            time_window = parse_time_window(text)
+        except ValueError as e:
+            Dialog().warningMessage(str(e))
+            return
+
+        db = Database.get()
+        db.save()
+        qInfo('{} saved'.format(db.fullpath.stem))
+
+        PALMS.NEXT_FILE = PALMS.CURRENT_FILE
+        PALMS.TIME_WINDOW = time_window
+        from logic.operation_mode.annotation import AnnotationConfig
+        AnnotationConfig.get().clear()
+        Partitions.delete_all()
+        self.REBOOT_APP = True
+        QtGui.QGuiApplication.exit(PALMS.EXIT_CODE_LOAD_WINDOW)
+
     def raise_sticky_fiducial_popup(self):
         pos = self.selectedDisplayPanel.plot_area.event_cursor_global_position
         if pos is not None:
@@ -572,6 +626,21 @@ class Viewer(QtWidgets.QMainWindow):
         else:
             sticky_fiducial = self.annotation_menu.sticky_fiducial_menu.exec_()
 
+    def undo_redo(self, step):
+        try:
+            step()
+        except Exception as e:
+            Dialog().warningMessage('Undo/redo failed with\r\n' + str(e))
+
+    def repin_fiducial(self, fiducial_name: str):
+        from logic.operation_mode.annotation import AnnotationConfig
+        try:
+            dropped = AnnotationConfig.get()[fiducial_name].repin_annotation()
+            self.selectedDisplayPanel.plot_area.redraw_fiducials()
+            qInfo('{}: re-pinned, {} annotations closer than min_distance dropped'.format(fiducial_name, dropped))
+        except Exception as e:
+            Dialog().warningMessage('Re-pinning {} failed with\r\n'.format(fiducial_name) + str(e))
+
     def toggle_sticky_fiducial_checkboxes(self):
         sender = self.sender()
         for ch in self.annotation_menu.sticky_fiducial_menu.actions():
@@ -1158,14 +1227,17 @@ class PALMS(object):  # Application - here's still the best place for it methink
     EXIT_CODE_REBOOT = -123
     EXIT_CODE_LOAD_NEXT = 1
     EXIT_CODE_LOAD_PREV = -1
+    EXIT_CODE_LOAD_WINDOW = 2
     PREV_FILE = None
     CURRENT_FILE = None
     NEXT_FILE = None
+    TIME_WINDOW = None  # (start, end) seconds of CURRENT_FILE which are loaded, None: the whole file, see initialize_new_file
     _instance = None
     config = config.default_config
     shortcuts = None
 
     def __init__(self, file_to_load: Path = None, **kwargs):
+        """:param kwargs: time_window=(start, end) in seconds loads only that part of the file, see Database.get_data"""
         start = timer()
         # sys.argv[0] = 'PALMS'  # to override Application menu on OSX
         QtCore.qInstallMessageHandler(self._log_handler)
@@ -1191,16 +1263,16 @@ class PALMS(object):  # Application - here's still the best place for it methink
         if (file_to_load is not None) and (db_name is not None) and (db_name in ALL_DATABASES):
             try:
                 db = getattr(sys.modules[DATABASE_MODULE_NAME], db_name).__call__()
-                self.initialize_new_file(file_to_load)
+                self.initialize_new_file(file_to_load, time_window=kwargs.get('time_window', None))
             except Exception as e:
                 Dialog().warningMessage(
                     'Loading requested file {} failed with \r\n {} \r\nPlease select a file manually'.format(file_to_load, str(e)))
                 self.request_user_input_database_and_file()
-                self.initialize_new_file(PALMS.CURRENT_FILE)
+                self.initialize_new_file(PALMS.CURRENT_FILE, time_window=kwargs.get('time_window', None))
 
         else:
             self.request_user_input_database_and_file()
-            self.initialize_new_file(PALMS.CURRENT_FILE)
+            self.initialize_new_file(PALMS.CURRENT_FILE, time_window=kwargs.get('time_window', None))
 
 
         if mode not in Mode.all_modes():
@@ -1224,11 +1296,16 @@ class PALMS(object):  # Application - here's still the best place for it methink
             Dialog().warningMessage('No file selected. Closing the app.')
             sys.exit(accepted)
 
-    def initialize_new_file(self, filepath: Path):
+    def initialize_new_file(self, filepath: Path, time_window: Optional[Tuple[float, Optional[float]]] = None):
         PALMS.CURRENT_FILE = filepath
+        PALMS.TIME_WINDOW = time_window
+        EditJournal.clear()  # edits of the previous file do not apply to this one, whether or not it has saved annotations
         db = Database.get()
         try:
-            db.get_data(filepath.as_posix())
+            if time_window is None:  # databases written before time windows were supported don't take the argument
+                db.get_data(filepath.as_posix())
+            else:
+                db.get_data(filepath.as_posix(), time_window=time_window)
         except Exception as e:
             Dialog().warningMessage(
                 'get_data() method failed on {} with \r\n'.format(filepath.name) +
@@ -1249,11 +1326,15 @@ class PALMS(object):  # Application - here's still the best place for it methink
             progress_str = str(file_idx) + '/' + str(n_files)
         except:
             progress_str = ''
+        if db.time_window is not None:
+            progress_str += ' [{:g} s - {}]'.format(db.time_window[0], 'end' if db.time_window[1] is None else '{:g} s'.format(db.time_window[1]))
         self.viewer.setWindowTitle(filepath.as_posix() + ' ' + progress_str)
         self.viewer.selectedDisplayPanel.plot_area.redraw_fiducials()
 
         from logic.operation_mode.annotation import AnnotationConfig
         self.viewer.get().annotationConfig.aConf_to_table(AnnotationConfig.get())
+        # index extrema of the pinned-to tracks while the file is opened, so the first annotation does not wait for it
+        self.viewer.get().annotationConfig.build_pinned_to_extrema(AnnotationConfig.get())
 
     @staticmethod
     def update_config():
@@ -1298,12 +1379,14 @@ class PALMS(object):  # Application - here's still the best place for it methink
             file_to_load = PALMS.NEXT_FILE
         elif exit_code == PALMS.EXIT_CODE_LOAD_PREV:
             file_to_load = PALMS.PREV_FILE
+        elif exit_code == PALMS.EXIT_CODE_LOAD_WINDOW:
+            file_to_load = PALMS.NEXT_FILE
 
         self.update_config()
         with open(config.CONFIG_PATH, 'w') as file:
             json.dump(PALMS.config, file, indent=4)
 
-        return (exit_code, file_to_load)
+        return (exit_code, file_to_load, PALMS.TIME_WINDOW)
 
     def _exit(self, status):
         self.update_config()
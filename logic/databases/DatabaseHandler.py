@@ -11,7 +11,7 @@ import os
 import pathlib
 import weakref
 from time import strftime, gmtime
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
 import h5py
 import numpy as np
@@ -21,8 +21,10 @@ from numpy.lib.format import magic
 from scipy.io import loadmat
 import pandas as pd
 from gui.tracking import Track
+from utils.signal_index import ChunkedArray
+from logic.operation_mode.edit_journal import EditJournal
 from logic.operation_mode.partitioning import Partitions
-from logic.operation_mode.epoch_mode import EpochModeConfig
+from logic.operation_mode.epoch_mode import EpochModeConfig, EpochStore
 from utils.utils_general import string_to_path, get_project_root
 from utils.utils_gui import Dialog
 
@@ -43,17 +45,24 @@ class Database(metaclass=abc.ABCMeta):
             Dialog().warningMessage('Databse not initialized yet\r\n return None')
             return None
 
+    WINDOW_FILE_TAG = '_window_'  # in the name of annotation files covering only a time window of the recording, see save
+
+    def _existing_annotation_files(self, filename) -> List[pathlib.Path]:
+        """annotation files of the whole recording, files saved from a time window only are not among them"""
+        return [f for f in pathlib.Path(self.existing_annotations_folder).rglob('*' + filename + '*' + '.h5')
+                if Database.WINDOW_FILE_TAG not in f.stem.partition(filename)[2]]
+
     def annotation_exists(self, filename):
         """checks whether an annotation file already exists"""
         # existing_annotation_file = pathlib.Path(self.existing_annotations_folder, filename + '.h5')
-        existing_annotation_file = list(pathlib.Path(self.existing_annotations_folder).rglob('*' + filename + '*' + '.h5'))
+        existing_annotation_file = self._existing_annotation_files(filename)
         if len(existing_annotation_file) > 0:
             return True
         else:
             return False
 
     def get_annotation_file(self, filename):
-        existing_annotation_file = list(pathlib.Path(self.existing_annotations_folder).rglob('*' + filename + '*' + '.h5'))
+        existing_annotation_file = self._existing_annotation_files(filename)
         if len(existing_annotation_file) > 0:
             return existing_annotation_file
         else:
@@ -77,21 +86,32 @@ class Database(metaclass=abc.ABCMeta):
         self.epoch_config_file: pathlib.Path = None  # resource_path(pathlib.Path('config', 'EpochConfig', 'EpochConfig_default_start_with_None.csv'))
         self.RR_interval_as_HR = True  # True: RR intervals in BPM, False: in seconds
         self.outputfile_prefix = ''  # set here your initials, to distinguish multiple annotators
+        self.time_window: Optional[Tuple[float, Optional[float]]] = None  # (start, end) seconds of the file to load, None: whole file
+        self.loaded_annotation_file: pathlib.Path = None  # annotations outside time_window are merged back from it on save
         Database._instance = weakref.ref(self)()
         Database.get()
 
     @abc.abstractmethod
-    def get_data(self, filename: pathlib.Path):
+    def get_data(self, filename: pathlib.Path, time_window: Optional[Tuple[float, Optional[float]]] = None):
         """
         describes the way how to get necessary data for each particular database case
         :param filename: ONE file to contain all tracks
+        :param time_window: (start, end) in seconds to load only a part of the file, end=None loads until the end of the file.
+        Subclasses should then read the signals with self._read_window() or self._read_csv_window(), the tracks start at time=0,
+        annotations, partitions and epochs are shifted and clipped to the window on load and merged back into the file on save
         :return: should fill in self.fullpath, self.tracks, self.track_labels
         self.tracks and self.track_labels should be populated in Database subclases
-        Wave objects in self.tracks should be np.array with floats
+        Wave objects in self.tracks should be np.array with floats; for long recordings use float32 (Wave(..., dtype=np.float32))
+        or a read-only memory-mapped source (Wave.from_npy, Wave.from_hdf5) to keep the signals out of RAM
         """
         filename = string_to_path(filename)  # make sure it is pathlib.Path
         if None in [filename]:
             raise ValueError('kwargs to {f} must contain filename'.format(f=inspect.stack()[0][3]))
+        if time_window is not None:
+            assert 0 <= time_window[0] and (time_window[1] is None or time_window[0] < time_window[1]), \
+                'time_window should be (start, end) with 0 <= start < end, got {}'.format(time_window)
+        self.time_window = time_window
+        self.loaded_annotation_file = None
         if filename.as_posix().endswith(self.filetype):
             filename = pathlib.Path(filename.as_posix()[:-(len(self.filetype))])
         fullpath = pathlib.Path(self.DATAPATH, filename.as_posix() + self.filetype)
@@ -130,6 +150,9 @@ class Database(metaclass=abc.ABCMeta):
             start = np.array(hf['partitions/start'])
             end = np.array(hf['partitions/end'])
             assert len(labels) == start.size & start.size == end.size, 'Every partition should have label, start and end'
+            labels, start, end = self._partitions_to_window(labels, start, end)
+            self.loaded_annotation_file = pathlib.Path(fullpath)
+            EditJournal.clear()  # edits made before loading do not apply to the loaded data
             Partitions.add_all(labels, start, end)
 
             from logic.operation_mode.annotation import AnnotationConfig
@@ -151,15 +174,17 @@ class Database(metaclass=abc.ABCMeta):
                           'default_label']]), 'Loaded file contains incorrect epoch mode data'
 
                     labels = [n.decode('ascii', 'ignore') for n in hf['epoch/label']]
-                    epoch_data = pd.DataFrame(
-                        {'start': hf['epoch/start'], 'end': hf['epoch/end'], 'is_modified': hf['epoch/is_modified'], 'label': labels})
                     keys = [n.decode('ascii', 'ignore') for n in hf['epoch/keys']]
                     all_labels = [n.decode('ascii', 'ignore') for n in hf['epoch/all_labels']]
                     description = [n.decode('ascii', 'ignore') for n in hf['epoch/description']]
                     default_label = hf['epoch/default_label'][0]
                     NONE_LABEL = hf['epoch/NONE_LABEL'][0]
+                    fill_label = default_label.decode('ascii', 'ignore') if isinstance(default_label, bytes) else default_label
+                    start, end, is_modified, labels, window_length = self._epochs_to_window(
+                        np.array(hf['epoch/start']), np.array(hf['epoch/end']), np.array(hf['epoch/is_modified']), labels, fill_label)
+                    epochs = EpochStore.from_arrays(start, end, is_modified, labels, [NONE_LABEL] + all_labels, window_length=window_length)
 
-                    EpochModeConfig.load_from_hdf5(epoch_data, keys, all_labels, default_label, NONE_LABEL, description=description)
+                    EpochModeConfig.load_from_hdf5(epochs, keys, all_labels, default_label, NONE_LABEL, description=description)
             except Exception as e:
                 Dialog().warningMessage('Epoch mode data cannot be loaded\r\n' +
                                         'The error was:\r\n' + str(e))
@@ -179,6 +204,18 @@ class Database(metaclass=abc.ABCMeta):
                 filename = self.outputfile_prefix + filename
             except Exception as e:
                 qInfo('Output file prefix could not be added')
+            if self.time_window is not None and self.loaded_annotation_file is None:
+                # nothing outside the window to merge with: the file covers the window only and is named so,
+                # otherwise a later load of the whole recording would take it for all its annotations
+                filename += '{}{:g}-{:g}s'.format(Database.WINDOW_FILE_TAG, *self._window_bounds())
+
+            outside = self._outside_window()  # read before the loaded file might be overwritten
+            try:
+                epochs = self._epochs_to_save(outside)
+            except ValueError as e:  # annotations and partitions are saved anyway
+                epochs = None
+                Dialog().warningMessage('Epochs of the loaded window can not be merged with the epochs of the rest of the file\r\n' +
+                                        str(e) + '\r\nEpochs are not saved, annotations and partitions are')
 
             fullpath = pathlib.Path(self.output_folder, filename + '.h5')
             OVERWRITE = kwargs.get('OVERWRITE', Viewer.get().settings_menu.save_overwrite_action.isChecked())
@@ -198,37 +235,21 @@ class Database(metaclass=abc.ABCMeta):
 
             group_annotations = hf.create_group('annotations')
             for f_idx, f in enumerate(aConf.fiducials):
+                ts, idx, amp = self._annotation_to_save(f.name, f.annotation, outside)
                 group_annotations.create_group(f.name)
-                group_annotations.create_dataset(f.name + '/ts', data=f.annotation.x)
-                group_annotations.create_dataset(f.name + '/idx', data=f.annotation.idx)
-                group_annotations.create_dataset(f.name + '/amp', data=f.annotation.y)
+                group_annotations.create_dataset(f.name + '/ts', data=ts)
+                group_annotations.create_dataset(f.name + '/idx', data=idx)
+                group_annotations.create_dataset(f.name + '/amp', data=amp)
 
             group_partitions = hf.create_group('partitions')
-            asciiList = [n.encode("ascii", "ignore") for n in Partitions.all_labels()]
+            labels, start, end = self._partitions_to_save(outside)
+            asciiList = [n.encode("ascii", "ignore") for n in labels]
             group_partitions.create_dataset('label', data=asciiList)
-            group_partitions.create_dataset('start', data=Partitions.all_startpoints())
-            group_partitions.create_dataset('end', data=Partitions.all_endpoints())
+            group_partitions.create_dataset('start', data=start)
+            group_partitions.create_dataset('end', data=end)
 
-            group_epoch = hf.create_group('epoch')
-            group_epoch.create_dataset('start', data=EpochModeConfig.get().window_data['start'].values)
-            group_epoch.create_dataset('end', data=EpochModeConfig.get().window_data['end'].values)
-            group_epoch.create_dataset('is_modified', data=EpochModeConfig.get().window_data['is_modified'].values)
-            asciiList = [n.encode("ascii", "ignore") for n in EpochModeConfig.get().window_data['label'].values]
-            group_epoch.create_dataset('label', data=asciiList)
-            asciiList = [n.encode("ascii", "ignore") for n in EpochModeConfig.get().keys]
-            group_epoch.create_dataset('keys', data=asciiList)
-
-            asciiList = [n.encode("ascii", "ignore") for n in EpochModeConfig.get().labels]
-            group_epoch.create_dataset('all_labels', data=asciiList)
-
-            asciiList = [n.encode("ascii", "ignore") for n in EpochModeConfig.get().description]
-            group_epoch.create_dataset('description', data=asciiList)
-
-            dt = h5py.special_dtype(vlen=str)
-            group_epoch.create_dataset('default_label', (1,), dtype=dt)
-            group_epoch['default_label'][:] = EpochModeConfig.get().default_label
-            group_epoch.create_dataset('NONE_LABEL', (1,), dtype=dt)
-            group_epoch['NONE_LABEL'][:] = EpochModeConfig.get().NONE_LABEL
+            if epochs is not None:
+                self._save_epochs(hf, *epochs)
 
             group_meta = hf.create_group('meta')
             dt = h5py.special_dtype(vlen=str)
@@ -241,6 +262,8 @@ class Database(metaclass=abc.ABCMeta):
             group_meta['filepath'][:] = self.fullpath.parent.as_posix()
             group_meta.create_dataset('main_track_label', (1,), dtype=dt)
             group_meta['main_track_label'][:] = self.main_track_label
+            if self.time_window is not None and self.loaded_annotation_file is None:
+                group_meta.create_dataset('time_window', data=np.array(self._window_bounds()))
 
             if Viewer.get().settings_menu.save_tracks_action.isChecked():
                 group_tracks = hf.create_group('tracks')
@@ -262,6 +285,29 @@ class Database(metaclass=abc.ABCMeta):
                                     e.__repr__() +
                                     '\r\nSaved using deprecated method, as CSV files.')
 
+    @staticmethod
+    def _save_epochs(hf: h5py.File, start: np.ndarray, end: np.ndarray, is_modified: np.ndarray, labels: List[str]):
+        group_epoch = hf.create_group('epoch')
+        group_epoch.create_dataset('start', data=start)
+        group_epoch.create_dataset('end', data=end)
+        group_epoch.create_dataset('is_modified', data=is_modified.astype(int))
+        asciiList = [n.encode("ascii", "ignore") for n in labels]
+        group_epoch.create_dataset('label', data=asciiList)
+        asciiList = [n.encode("ascii", "ignore") for n in EpochModeConfig.get().keys]
+        group_epoch.create_dataset('keys', data=asciiList)
+
+        asciiList = [n.encode("ascii", "ignore") for n in EpochModeConfig.get().labels]
+        group_epoch.create_dataset('all_labels', data=asciiList)
+
+        asciiList = [n.encode("ascii", "ignore") for n in EpochModeConfig.get().description]
+        group_epoch.create_dataset('description', data=asciiList)
+
+        dt = h5py.special_dtype(vlen=str)
+        group_epoch.create_dataset('default_label', (1,), dtype=dt)
+        group_epoch['default_label'][:] = EpochModeConfig.get().default_label
+        group_epoch.create_dataset('NONE_LABEL', (1,), dtype=dt)
+        group_epoch['NONE_LABEL'][:] = EpochModeConfig.get().NONE_LABEL
+
     @deprecated('Default way is to save annotations and partitions together as hdf5')
     def _save_as_csv(self, *, filename: str, save_idx: bool):
         from logic.operation_mode.annotation import AnnotationConfig
@@ -319,6 +365,8 @@ class Database(metaclass=abc.ABCMeta):
         pass
 
     def _set_annotation_from_time(self, fiducial_name, ts):
+        """ts are times in the file, when only a time window is loaded they are shifted and clipped to it"""
+        ts = self._file_to_window_time(ts)
         assert self.tracks is not None and self.main_track_label is not None
         assert self.aConf_is_loaded()
         assert fiducial_name in [s.name for s in self.tracks[self.main_track_label].aConf.fiducials], '{} fiducial is not listed in {}'.format(
@@ -328,6 +376,7 @@ class Database(metaclass=abc.ABCMeta):
         aConf.fiducials[aConf.find_idx_by_name(fiducial_name)].set_annotation_from_time(ts, self.tracks[self.main_track_label])
 
     def _set_annotation_from_idx(self, fiducial_name, idx: np.ndarray):
+        """idx are sample indices of the main track as loaded, i.e. counted from the start of the time window"""
         idx = idx.astype(int)
         assert self.tracks is not None and self.main_track_label is not None, 'tracks are not set or main_track_label is not specified'
         assert self.aConf_is_loaded(), 'annotation configuration is not loaded at the moment you try to set annotation'
@@ -336,6 +385,176 @@ class Database(metaclass=abc.ABCMeta):
         aConf = AnnotationConfig.get()
         aConf.fiducials[aConf.find_idx_by_name(fiducial_name)].set_annotation_from_idx(idx, self.tracks[self.main_track_label])
 
+    def _repin_annotation(self, fiducial_name):
+        """snaps annotations set with _set_annotation_from_time/_set_annotation_from_idx to the pinned_to peak or valley"""
+        assert self.tracks is not None and self.main_track_label is not None, 'tracks are not set or main_track_label is not specified'
+        assert self.aConf_is_loaded(), 'annotation configuration is not loaded at the moment you try to re-pin annotation'
+        assert fiducial_name in [s.name for s in self.tracks[self.main_track_label].aConf.fiducials]
+        from logic.operation_mode.annotation import AnnotationConfig
+        aConf = AnnotationConfig.get()
+        with EditJournal.paused():  # part of loading, not an edit which can be undone
+            dropped = aConf.fiducials[aConf.find_idx_by_name(fiducial_name)].repin_annotation()
+        qInfo('{}: re-pinned, {} annotations closer than min_distance dropped'.format(fiducial_name, dropped))
+
+    def _window_slice(self, fs: float) -> slice:
+        """samples of a signal sampled at fs which fall in self.time_window"""
+        if self.time_window is None:
+            return slice(0, None)
+        start, end = self.time_window
+        return slice(int(round(start * fs)), None if end is None else int(round(end * fs)))
+
+    def _read_window(self, source, fs: float) -> np.ndarray:
+        """
+        samples of self.time_window of a single channel signal, e.g. f['/data/ecg/signal'] of a -v7.3 mat file.
+        Only the window is read from an h5py.Dataset, shapes (n, 1) and (1, n) are flattened
+        """
+        return ChunkedArray(source)[self._window_slice(fs)]
+
+    def _read_csv_window(self, fullpath: pathlib.Path, fs: float, **kwargs) -> pd.DataFrame:
+        """pd.read_csv(fullpath, **kwargs) of the rows in self.time_window only, given one row per sample at fs after the header"""
+        window = self._window_slice(fs)
+        if window == slice(0, None):
+            return pd.read_csv(fullpath, **kwargs)
+        nrows = None if window.stop is None else window.stop - window.start
+        if kwargs.get('header', 'infer') is None:
+            return pd.read_csv(fullpath, skiprows=window.start, nrows=nrows, **kwargs)
+        names = pd.read_csv(fullpath, nrows=0, **kwargs).columns  # the header is kept, the rows before the window are skipped
+        kwargs = {k: v for k, v in kwargs.items() if k not in ['header', 'names']}
+        return pd.read_csv(fullpath, skiprows=window.start + 1, nrows=nrows, header=None, names=names, **kwargs)
+
+    def _window_bounds(self) -> Tuple[float, float]:
+        """first and last sample time of the main track in the file, (0, last sample time) if the whole file is loaded"""
+        track = self.tracks[self.main_track_label]
+        offset = self._window_slice(track.fs).start / track.fs
+        return offset, offset + track.maxX
+
+    def window_start(self) -> float:
+        """time in the file of the first loaded sample of the main track, 0 if the whole file is loaded"""
+        return self._window_bounds()[0]
+
+    def _file_to_window_time(self, ts: np.ndarray) -> np.ndarray:
+        if self.time_window is None:
+            return ts
+        w0, w1 = self._window_bounds()
+        ts = np.asarray(ts, dtype=float)
+        return ts[(ts >= w0) & (ts <= w1)] - w0
+
+    def _partitions_to_window(self, labels: List[str], start: np.ndarray, end: np.ndarray):
+        """partitions overlapping the loaded window, shifted and clipped to it"""
+        if self.time_window is None:
+            return labels, start, end
+        w0, w1 = self._window_bounds()
+        inside = (start < w1) & (end > w0)
+        return [l for l, i in zip(labels, inside) if i], np.clip(start[inside], w0, w1) - w0, np.clip(end[inside], w0, w1) - w0
+
+    def _epochs_to_window(self, start: np.ndarray, end: np.ndarray, is_modified: np.ndarray, labels: List[str], default_label: str):
+        """
+        epochs covering the whole loaded window, shifted to it, and their length. They stay on the grid of the epochs in the file,
+        parts of the window without epochs in the file get default_label
+        """
+        window_length = end[0] - start[0]
+        if self.time_window is None:
+            return start, end, is_modified, labels, window_length
+        w0, w1 = self._window_bounds()
+        tol = 1e-6  # of window_length, so that window edges on the grid don't add an empty epoch
+        k = np.arange(int(np.floor((w0 - start[0]) / window_length + tol)), int(np.ceil((w1 - start[0]) / window_length - tol)))
+        in_file = (k >= 0) & (k < start.size)
+        w_start = start[0] + k * window_length - w0
+        w_is_modified = np.zeros(k.size, dtype=bool)
+        w_is_modified[in_file] = np.asarray(is_modified, dtype=bool)[k[in_file]]
+        w_labels = [labels[i] if f else default_label for i, f in zip(k, in_file)]
+        return w_start, np.minimum(w_start + window_length, w1 - w0), w_is_modified, w_labels, window_length
+
+    def _outside_window(self) -> Optional[dict]:
+        """
+        annotations, partitions and epochs of self.loaded_annotation_file outside the loaded window, which are merged
+        with the edited window on save. None if the whole file is loaded or no annotation file was loaded
+        """
+        if self.time_window is None or self.loaded_annotation_file is None:
+            return None
+        w0, w1 = self._window_bounds()
+        with h5py.File(self.loaded_annotation_file, 'r') as hf:
+            annotations = {}
+            for f_name in hf['annotations'].keys():
+                ts = np.array(hf['annotations/' + f_name + '/ts'])
+                outside = (ts < w0) | (ts > w1)
+                annotations[f_name] = tuple(np.array(hf['annotations/{}/{}'.format(f_name, k)])[outside] for k in ['ts', 'idx', 'amp'])
+
+            labels = [n.decode('ascii', 'ignore') for n in hf['partitions/label']]
+            start, end = np.array(hf['partitions/start'], dtype=float), np.array(hf['partitions/end'], dtype=float)
+            # partitions crossing the window edges keep their parts outside, see _partitions_to_save
+            before, after = start < w0, end > w1
+            partitions = ([l for l, b in zip(labels, before) if b] + [l for l, a in zip(labels, after) if a],
+                          np.r_[start[before], np.maximum(start[after], w1)], np.r_[np.minimum(end[before], w0), end[after]])
+
+            epochs = None
+            if 'epoch' in hf.keys():
+                start, end = np.array(hf['epoch/start'], dtype=float), np.array(hf['epoch/end'], dtype=float)
+                outside = (start >= w1) | (end <= w0)
+                epochs = (start[outside], end[outside], np.array(hf['epoch/is_modified'], dtype=bool)[outside],
+                          [n.decode('ascii', 'ignore') for n, o in zip(hf['epoch/label'], outside) if o])
+        return {'annotations': annotations, 'partitions': partitions, 'epochs': epochs}
+
+    def _annotation_to_save(self, fiducial_name: str, annotation, outside: Optional[dict]) -> Tuple[np.ndarray, ...]:
+        """ts, idx and amp of the annotation in the file"""
+        if self.time_window is None:
+            return annotation.x, annotation.idx, annotation.y
+        w0, _ = self._window_bounds()
+        ts, idx, amp = annotation.x + w0, annotation.idx + self._window_slice(self.tracks[self.main_track_label].fs).start, annotation.y
+        if outside is not None and fiducial_name in outside['annotations']:
+            ts, idx, amp = (np.r_[o, w] for o, w in zip(outside['annotations'][fiducial_name], (ts, idx, amp)))
+            order = np.argsort(ts, kind='stable')
+            ts, idx, amp = ts[order], idx[order], amp[order]
+        return ts, idx, amp
+
+    def _partitions_to_save(self, outside: Optional[dict]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """labels, start and end of the partitions in the file"""
+        labels, start, end = Partitions.all_labels(), Partitions.all_startpoints(), Partitions.all_endpoints()
+        if self.time_window is None:
+            return labels, start, end
+        w0, w1 = self._window_bounds()
+        start, end = start + w0, end + w0
+        if outside is not None:
+            labels, start, end = labels + outside['partitions'][0], np.r_[start, outside['partitions'][1]], np.r_[end, outside['partitions'][2]]
+            order = np.argsort(start, kind='stable')
+            merged = []
+            for l, s, e in zip([labels[i] for i in order], start[order], end[order]):
+                # a partition crossing a window edge was split on load, its parts are joined again if they still meet at the edge
+                if merged and merged[-1][0] == l and np.isclose(merged[-1][2], s) and (np.isclose(s, w0) or np.isclose(s, w1)):
+                    merged[-1][2] = e
+                else:
+                    merged.append([l, s, e])
+            labels, start, end = [m[0] for m in merged], np.array([m[1] for m in merged]), np.array([m[2] for m in merged])
+        return labels, start, end
+
+    def _epochs_to_save(self, outside: Optional[dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[str]]:
+        """
+        start, end, is_modified and labels of the epochs in the file: the epochs of the loaded window and the epochs of the file
+        outside it on one grid, epochs between them (e.g. between two windows annotated separately) get the default label.
+        Raises ValueError if the epochs of the file are not on the grid of the window epochs
+        """
+        epoch_config = EpochModeConfig.get()
+        epochs = epoch_config.epochs
+        start, end, is_modified, labels = epochs.starts(), epochs.ends(), epochs.is_modified, epochs.labels()
+        if self.time_window is None:
+            return start, end, is_modified, labels
+        w0, _ = self._window_bounds()
+        start, end = start + w0, end + w0
+        if outside is None or outside['epochs'] is None or not len(outside['epochs'][2]):
+            return start, end, is_modified, labels
+        o_start, o_end, o_is_modified, o_labels = outside['epochs']
+        window_length = epochs.window_length
+        o_k = np.rint((o_start - start[0]) / window_length).astype(np.int64)  # position on the grid of the window epochs
+        if not np.allclose(start[0] + o_k * window_length, o_start, rtol=0, atol=1e-6 * window_length):
+            raise ValueError('epochs outside the loaded window are not on the grid of the epochs of the window')
+        first, last = min(o_k.min(), 0), max(o_k.max() + 1, len(epochs))
+        m_is_modified = np.zeros(last - first, dtype=bool)
+        m_labels = np.full(last - first, epoch_config.default_label, dtype=object)
+        m_is_modified[o_k - first], m_labels[o_k - first] = o_is_modified, o_labels
+        m_is_modified[-first:len(epochs) - first], m_labels[-first:len(epochs) - first] = is_modified, labels
+        m_start = start[0] + np.arange(first, last) * window_length
+        return m_start, np.minimum(m_start + window_length, max(o_end.max(), end[-1])), m_is_modified, list(m_labels)
+
     def _get_matfile_object(self, fullpath: pathlib.Path):
         try:  # MATLAB 7.3 file needs to be loaded as HDF5 [install HDF5 on your pc from hdfgroup.org]
             return h5py.File(fullpath, 'r')
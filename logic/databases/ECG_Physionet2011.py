@@ -7,7 +7,6 @@ See COPYING, README.
 import os
 import pathlib
 
-import pandas as pd
 from PyQt5.QtCore import qInfo
 
 from gui.tracking import Wave
@@ -37,12 +36,12 @@ class ECG_Physionet2011(Database):  # NB: !!!!!!!!!!!  class name should be equa
         self.outputfile_prefix = ''  # NB: set here your initials, to distinguish multiple annotators' files
         assert 'csv' in self.annotation_config_file.suffix, 'Currently only .csv are supported as annotation configuration'
 
-    def get_data(self, filename):
+    def get_data(self, filename, time_window=None):
         # NB: here one needs to define the way data is fetched from the source
         #  In the end the annotated signal and all references have to be defined as Wave-instances
 
         # NB: 1. Run base class to initialize some variables:
-        super().get_data(filename)
+        super().get_data(filename, time_window)
         # self.output_folder = self.fullpath.parent  # to save in the same location
         # self.output_folder = get_project_root()  # to save in project root/near the executable
         self.output_folder = self.fullpath.parent
@@ -54,9 +53,9 @@ class ECG_Physionet2011(Database):  # NB: !!!!!!!!!!!  class name should be equa
 
         tracks = {}
         # NB: 2.1 Load data from a file
-        txt_data = pd.read_csv(self.fullpath.as_posix(), header=None)
-        ecg = txt_data.iloc[:, 1].values
         Fs_ecg = 500
+        txt_data = self._read_csv_window(self.fullpath.as_posix(), Fs_ecg, header=None)  # NB: only time_window rows, if given
+        ecg = txt_data.iloc[:, 1].values
 
         ecg_data = ecg
         # NB: 2.2 Convert\preprocess data, create new representations
@@ -31,12 +31,12 @@ class EXAMPLE_PPG(Database):  # NB: !!!!!!!!!!!  class name should be equal to d
         self.outputfile_prefix = ''  # NB: set here your initials, to distinguish multiple annotators' files
         assert 'csv' in self.annotation_config_file.suffix, 'Currently only .csv are supported as annotation configuration'
 
-    def get_data(self, filename):
+    def get_data(self, filename, time_window=None):
         # NB: here one needs to define the way data is fetched from the source
         #  In the end the annotated signal and all references have to be defined as Wave-instances
 
         # NB: 1. Run base class to initialize some variables:
-        super().get_data(filename)
+        super().get_data(filename, time_window)
 
         # NB: 2. Fetch data from self.fullpath and create tracks: Dict[label:str,track:Wave]
         #  At this step signals from the source can be filtered (one also can have multiple versions of the same signal),
@@ -49,10 +49,13 @@ class EXAMPLE_PPG(Database):  # NB: !!!!!!!!!!!  class name should be equal to d
         # f['/data/ecg/signal'] if mat was saved as '-v7.3' (hdf5)
         # f['data'].ecg.signal if mat was saved as earlier version
 
-        ecg_data = np.concatenate(np.array(f['/data/ecg/signal']))  # NB: loaded data
+        # recordings larger than memory can be kept on disk instead: Wave.from_hdf5(f['/data/ppg/signal'], Fs_ppg, label='ppg')
+        # reads only the samples which are plotted or annotated (f must stay open then)
+        # NB: _read_window reads only the time_window (if given) of a signal, the whole signal otherwise
         Fs_ecg = int(np.array(f['/data/ecg/fs']))
-        ppg_data = np.concatenate(np.array(f['/data/ppg/signal']))
+        ecg_data = self._read_window(f['/data/ecg/signal'], Fs_ecg)  # NB: loaded data
         Fs_ppg = int(np.array(f['/data/ppg/fs']))
+        ppg_data = self._read_window(f['/data/ppg/signal'], Fs_ppg)
 
         # NB: 2.2 Convert\preprocess data, create new representations
         ppg_filt_data = butter_lowpass_filter(ppg_data, 5, Fs_ppg, order=2)  # NB: created and filtered data
@@ -89,7 +92,7 @@ class EXAMPLE_PPG(Database):  # NB: !!!!!!!!!!!  class name should be equal to d
             except Exception as e:
                 Dialog().warningMessage('Loading annotations from {} failed\r\n'.format(existing_annotation_file) + str(e))
         else:
-            # # NB: 1. Find\fetch preliminary annotation data
+            # # NB: 1. Find\fetch preliminary annotation data (times in the file, they are clipped to time_window if one is loaded)
             f = self._get_matfile_object(self.fullpath)
             offset = np.concatenate(np.array(f['/data/ppg/ts']))[0]  # offset to start at time=0 as signals themselves
             peak = np.concatenate(np.array(f['/data/annotations/ppg/peak/timestamps'])) - offset
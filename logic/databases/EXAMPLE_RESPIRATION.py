@@ -34,12 +34,12 @@ class EXAMPLE_RESPIRATION(Database):
         self.outputfile_prefix = ''  # NB: set here your initials, to distinguish multiple annotators' files
         assert 'csv' in self.annotation_config_file.suffix, 'Currently only .csv are supported as annotation configuration'
 
-    def get_data(self, filename):
+    def get_data(self, filename, time_window=None):
         # NB: here one needs to define the way data is fetched from the source
         #  In the end the annotated signal and all references have to be defined as Wave-instances
 
         # NB: 1. Run base class to initialize some variables:
-        super().get_data(filename)
+        super().get_data(filename, time_window)
 
         # NB: 2. Fetch data from self.fullpath and create tracks: Dict[label:str,track:Wave]
         #  At this step signals from the source can be filtered (one also can have multiple versions of the same signal),
@@ -49,12 +49,13 @@ class EXAMPLE_RESPIRATION(Database):
         # NB: 2.1 Load data from a mat-file
         f = self._get_matfile_object(self.fullpath)
 
-        ecg_data = np.concatenate(np.array(f['/data/ekg/v']))
+        # NB: _read_window reads only the time_window (if given) of a signal, the whole signal otherwise
         Fs_ecg = 125
-        ppg_data = np.concatenate(np.array(f['/data/ppg/v']))
+        ecg_data = self._read_window(f['/data/ekg/v'], Fs_ecg)
         Fs_ppg = 125
-        resp_data = np.concatenate(np.array(f['/data/ref/resp_sig/imp/v']))
+        ppg_data = self._read_window(f['/data/ppg/v'], Fs_ppg)
         Fs_resp = 125
+        resp_data = self._read_window(f['/data/ref/resp_sig/imp/v'], Fs_resp)
         # NB: 2.2 Convert\preprocess data, create new representation
         resp_data = butter_lowpass_filter(resp_data, 3, Fs_resp, order=2)  # NB: created and filtered data
 
@@ -104,6 +105,8 @@ class EXAMPLE_RESPIRATION(Database):
             self._set_annotation_from_idx('valley', idx_valley)
             self._set_annotation_from_idx('upstroke', idx_upstroke)
             self._set_annotation_from_idx('downstroke', idx_downstroke)
+            # NB: 3. OPTIONAL!!! Snap detector output to the pinned_to peak\valley of the AnnotationConfig file, e.g.
+            #  self._repin_annotation('peak')
 
     def save(self, **kwargs):
         try:
@@ -4,9 +4,8 @@ https://www.imec-int.com/en/imec-the-netherlands
 @license GPL-3.0+ <http://spdx.org/licenses/GPL-3.0+>
 See COPYING, README.
 """
-import bisect
 import weakref
-from typing import List
+from typing import Tuple
 
 import numpy as np
 import pandas as pd
@@ -17,41 +16,95 @@ from qtpy.QtCore import Signal
 from win32com.client import Dispatch
 
 from logic.databases.DatabaseHandler import Database
-from utils.detect_peaks import detect_peaks
-from utils.utils_general import find_closest, dict_to_df_with_nans
+from logic.operation_mode.edit_journal import AnnotationEdit, EditJournal
+from utils.signal_index import SortedSamples
+from utils.utils_general import dict_to_df_with_nans
 
 
 class Annotation(QObject):
     signal_annotate = pyqtSignal(float)
     signal_delete_annotation = pyqtSignal(float)
+    signal_edited = pyqtSignal(str, int)  # after the store has changed: 'added'/'deleted' and sample index, or 'reset' and -1
 
-    def __init__(self, fiducial_name, x_=np.array([]), y_=np.array([]), parent=None):
+    def __init__(self, fiducial_name, parent=None):
         super(QObject, self).__init__(parent)
         self.name = fiducial_name.lower()
-        self.x = x_
-        self.y = y_
-        self.idx = np.array([])
+        self.store = SortedSamples()  # sample indices in the main track; times and amplitudes are derived from them
+        self._cache = (None, None, None)  # (idx, x, y) the derived x and y were computed for
         self.signal_annotate.connect(self.add)
         self.signal_delete_annotation.connect(self.delete)
 
+    @staticmethod
+    def track():
+        db = Database.get()
+        return db.tracks[db.main_track_label]
+
+    def set_idx(self, idx: np.ndarray):
+        self.store = SortedSamples(idx)
+        self.signal_edited.emit('reset', -1)
+
+    def apply_edit(self, added: np.ndarray, removed: np.ndarray):
+        """adds and removes sample indices, e.g. when an edit is undone or redone (see EditJournal)"""
+        if added.size + removed.size > 64:
+            idx = self.store.to_array()
+            self.set_idx(np.r_[idx[~np.isin(idx, removed)], added])
+            return
+        for i in removed:
+            self.store.remove(i)
+            self.signal_edited.emit('deleted', int(i))
+        for i in added:
+            self.store.insert(i)
+            self.signal_edited.emit('added', int(i))
+
+    def get_idx(self):
+        return self.store.to_array()
+
+    idx = property(get_idx)
+
+    def _derived(self):
+        idx = self.store.to_array()
+        if self._cache[0] is not idx:
+            track = self.track()
+            self._cache = (idx, track.ts[idx], track.value[idx])
+        return self._cache
+
+    def get_x(self):
+        return self._derived()[1]
+
+    x = property(get_x)
+
+    def get_y(self):
+        return self._derived()[2]
+
+    y = property(get_y)
+
+    def nearest(self, x: float):
+        """:return: sample index of the annotation closest in time to x, None if there are no annotations"""
+        ts = self.track().ts
+        prev, nxt = self.store.neighbours(np.searchsorted(ts, x, 'right') - 1)
+        if prev is None or (nxt is not None and abs(ts[nxt] - x) < abs(x - ts[prev])):
+            return nxt
+        return prev
+
+    def remove_between(self, x1: float, x2: float) -> int:
+        """remove annotations strictly between x1 and x2, :return: number of removed annotations"""
+        ts = self.track().ts
+        lo, hi = np.searchsorted(ts, x1, 'right'), np.searchsorted(ts, x2, 'left')
+        removed = self.store.between(lo, hi)
+        if removed.size:
+            self.store.remove_between(lo, hi)
+            EditJournal.record(AnnotationEdit(self.name, removed=removed))
+            self.signal_edited.emit('reset', -1)
+        return removed.size
+
     def find_annotation_between_two_ts(self, x1, x2):
         """
         finds annotation points within given x-limits. used to redraw only part of the annotations when zooming\moving a plot
         !!! MUST be computationally efficient otherwise will slow down browsing through the plot
         """
-        x, y = np.array([]), np.array([])
-
-        # import time
-        # s = time.time()
-        # for i in np.arange(10000):
-        #     idx = np.arange(np.searchsorted(self.x, x1, 'right'), np.searchsorted(self.x, x2, 'left'))
-        idx = np.arange(bisect.bisect_right(self.x, x1), bisect.bisect_left(self.x, x2))
-        # en = time.time() - s
-
-        if idx.size > 0:
-            x = self.x[idx]
-            y = self.y[idx]
-        return np.array(x), np.array(y)
+        track = self.track()
+        idx = self.store.between(np.searchsorted(track.ts, x1, 'right'), np.searchsorted(track.ts, x2, 'left'))
+        return track.ts[idx], track.value[idx]
 
     @pyqtSlot(float)
     def delete(self, x):
@@ -59,17 +112,15 @@ class Annotation(QObject):
         plot_area = Viewer.get().selectedDisplayPanel.plot_area
 
         fiducial_name = self.name
-        fConf = AnnotationConfig.get()[fiducial_name]
-        if fConf.annotation.x.size > 0:
-            # closest_idx, _, _ = find_closest(fConf.annotation.x, np.array([x]))
-            closest_idx = np.argmin(abs(x - fConf.annotation.x))
-            deleted_x, deleted_y = fConf.annotation.x[closest_idx], fConf.annotation.y[closest_idx]
-
-            fConf.annotation.x = np.delete(fConf.annotation.x, closest_idx)
-            fConf.annotation.y = np.delete(fConf.annotation.y, closest_idx)
-            fConf.annotation.idx = np.delete(fConf.annotation.idx, closest_idx)
-
-            Viewer.get().selectedDisplayPanel.plot_area.redraw_fiducials()
+        closest_idx = self.nearest(x)
+        if closest_idx is not None:
+            track = self.track()
+            deleted_x, deleted_y = track.ts[closest_idx], track.value[closest_idx]
+            self.store.remove(closest_idx)
+            EditJournal.record(AnnotationEdit(self.name, removed=[closest_idx]))
+            self.signal_edited.emit('deleted', closest_idx)
+
+            plot_area.refresh_fiducial(fiducial_name)
             plot_area.signal_annotation_added.emit(deleted_x, deleted_y, 'deleted')
             qInfo('{n} deleted'.format(n=fiducial_name))
         else:
@@ -87,27 +138,12 @@ class Annotation(QObject):
         ts = track.get_time()
         fConf = AnnotationConfig.get()[fiducial_name]
 
-        insert_index = bisect.bisect_right(fConf.annotation.x, x)
+        prev_idx, next_idx = self.store.neighbours(np.searchsorted(ts, x, 'right') - 1)
 
+        # a new annotation must stay min_distance away from both neighbours: allowed_region is [lo, hi) of the sample indices which do
         min_distance_samples = round(fs * fConf.min_distance)
-        blocked_region = np.array([])
-        if insert_index > 0:
-            blocked_region = np.arange(fConf.annotation.idx[insert_index - 1],
-                                       fConf.annotation.idx[insert_index - 1] + min_distance_samples)
-        if len(fConf.annotation.idx) > insert_index:
-            blocked_region = np.append(blocked_region, np.arange(fConf.annotation.idx[insert_index] - min_distance_samples,
-                                                                 fConf.annotation.idx[insert_index] + 1))
-
-        if insert_index > 0 and fConf.annotation.idx.size > insert_index:
-            allowed_region = np.arange(fConf.annotation.idx[insert_index - 1] + min_distance_samples,
-                                       fConf.annotation.idx[insert_index] - min_distance_samples)
-        elif insert_index > 0 and fConf.annotation.idx.size == insert_index:
-            allowed_region = np.arange(fConf.annotation.idx[insert_index - 1] + min_distance_samples,
-                                       ts.shape[0])
-        elif insert_index == 0 and fConf.annotation.idx.size > insert_index:
-            allowed_region = np.arange(0, fConf.annotation.idx[insert_index] - min_distance_samples)
-        elif insert_index == 0 and fConf.annotation.idx.size == insert_index:
-            allowed_region = np.arange(0, ts.shape[0])
+        allowed_region = (0 if prev_idx is None else prev_idx + min_distance_samples,
+                          ts.shape[0] if next_idx is None else next_idx - min_distance_samples)
 
         pinned_to_track = plot_area.main_window.selectedPanel.get_view_from_track_label(fConf.pinned_to_track_label).track
         if fConf.is_pinned:
@@ -117,88 +153,94 @@ class Annotation(QObject):
         if x is None:
             qInfo('{}: duplicate annotation; min_distance is set to {} s'.format(fiducial_name.upper(), fConf.min_distance))
             return
-        ind, _, _ = find_closest(ts, np.array([x]))
-        assert len(ind) == 1
-
-        insert_index = bisect.bisect_right(fConf.annotation.x, x)
-
-        # min_distance_samples = round(fs * fConf.min_distance)
-        # blocked_region = np.array([])
-        # if insert_index > 0:
-        #     blocked_region = np.arange(fConf.annotation.idx[insert_index - 1],
-        #                                fConf.annotation.idx[insert_index - 1] + min_distance_samples)
-        # if len(fConf.annotation.idx) > insert_index:
-        #     blocked_region = np.append(blocked_region, np.arange(fConf.annotation.idx[insert_index] - min_distance_samples,
-        #                                                          fConf.annotation.idx[insert_index] + 1))
-
-        if not ind[0] in blocked_region:
-            fConf.annotation.idx = np.insert(fConf.annotation.idx, insert_index, ind[0])
-            fConf.annotation.x = np.insert(fConf.annotation.x, insert_index, ts[ind[0]])
-            y = amp[ind[0]]
-            fConf.annotation.y = np.insert(fConf.annotation.y, insert_index, y)
+        ind = track.find_nearest_sample(x)
+
+        blocked = (prev_idx is not None and prev_idx <= ind < prev_idx + min_distance_samples) or \
+                  (next_idx is not None and next_idx - min_distance_samples <= ind <= next_idx)
+        if not blocked:
+            self.store.insert(ind)
+            EditJournal.record(AnnotationEdit(self.name, added=[ind]))
+            self.signal_edited.emit('added', ind)
+            y = amp[ind]
+            plot_area.add_fiducial_point(fiducial_name, ts[ind], y)
             plot_area.signal_annotation_added.emit(x, y, 'added')
             qInfo('{n}: x= {X} y= {Y}'.format(n=fiducial_name, X=str(np.round(x, 2)), Y=str(np.round(y, 2))))
         else:
             qInfo('{}: duplicate annotation; min_distance is set to {} s'.format(fiducial_name.upper(), fConf.min_distance))
             return
 
-    def pin(self, x: float, track, pinned_to: str, pinned_window: float, allowed_region_idx: List[int]):
-        DEBUG = False
+    def pin(self, x: float, track, pinned_to: str, pinned_window: float, allowed_region_idx: Tuple[int, int]):
+        """
+        moves x to the most prominent peak or valley of track within pinned_window around x
+        :param allowed_region_idx: [first, last) sample indices the pinned annotation may fall in
+        """
         window = pinned_window  # sec
+        allowed_first, allowed_last = allowed_region_idx
 
-        if len(allowed_region_idx) < 3:
+        if allowed_last - allowed_first < 3:
             return None
-
-        amp = track.value
-        ts = track.get_time()
-        fs = track.get_fs()
-
-        x_ind = np.argmin(abs(ts - x))
-        left_x_ind, right_x_ind = int(max([x_ind - round(fs * window), 0])), int(min([x_ind + round(fs * window), amp.size]))
-        left_x_ind, right_x_ind = int(max([allowed_region_idx[0], left_x_ind])), int(min(
-            [allowed_region_idx[-1], right_x_ind]))  # both within window and allowed region
-        sx, sy = ts[left_x_ind:right_x_ind], amp[left_x_ind:right_x_ind]
-        # sy = scipy.signal.medfilt(sy, round_to_odd(fs * 0.02))  # TODO: parametrize smoothing
-
-        if pinned_to.lower().__contains__('peak'):
-            ind = detect_peaks(sy, show=DEBUG)
-        elif pinned_to.lower().__contains__('valley'):
-            ind = detect_peaks(sy, valley=True, show=DEBUG)
-        else:
+        if not ('peak' in pinned_to.lower() or 'valley' in pinned_to.lower()):
             raise ValueError
 
-        if ind.size > 0:
-            closest, _, _ = find_closest(ind + left_x_ind, np.array([x_ind]))
-            highest = np.argmax(abs(sy[ind] - np.mean(sy)))
-            ind_to_return = highest  # take highest of all peaks found
-            return sx[ind[ind_to_return]]
+        fs = track.get_fs()
+        x_ind = track.find_nearest_sample(x)
+        left_x_ind, right_x_ind = int(max([x_ind - round(fs * window), 0])), int(min([x_ind + round(fs * window), track.value.size]))
+        left_x_ind, right_x_ind = int(max([allowed_first, left_x_ind])), int(min(
+            [allowed_last - 1, right_x_ind]))  # both within window and allowed region
+
+        ind = track.get_extrema(pinned_to).most_prominent(left_x_ind, right_x_ind)
+        if ind is not None:
+            return track.get_time()[ind]
         else:
             qInfo('{p} not found'.format(p=pinned_to))
             return x
 
+    def repin(self, track, pinned_to: str, pinned_window: float, min_distance: float) -> int:
+        """
+        pins all annotations at once: each one moves to the most prominent peak or valley of track within pinned_window
+        around it (or stays where it is if there is none), then annotations closer than min_distance to the previous one are dropped.
+        :return: number of dropped annotations
+        """
+        if len(self.store) == 0:
+            return 0
+        if not ('peak' in pinned_to.lower() or 'valley' in pinned_to.lower()):
+            raise ValueError
+        main_track = self.track()
+        x = self.x
+        x_ind = track.find_nearest_sample(x)
+        window = round(track.get_fs() * pinned_window)
+        pinned = track.get_extrema(pinned_to).most_prominent_many(np.maximum(x_ind - window, 0), x_ind + window)
+        x = np.where(pinned >= 0, track.get_time()[np.maximum(pinned, 0)], x)
+        idx = np.unique(main_track.find_nearest_sample(x))
+
+        # greedy min_distance pass, only annotations too close to their predecessor need to be checked one by one
+        min_distance_samples = round(main_track.fs * min_distance)
+        keep = np.ones(idx.size, dtype=bool)
+        for i in np.flatnonzero(np.diff(idx) < min_distance_samples) + 1:
+            prev = i - 1
+            while not keep[prev]:
+                prev -= 1
+            keep[i] = idx[i] - idx[prev] >= min_distance_samples
+        dropped = len(self.store) - np.count_nonzero(keep)
+        old_idx = self.store.to_array()
+        self.set_idx(idx[keep])
+        EditJournal.record(AnnotationEdit(self.name, added=np.setdiff1d(idx[keep], old_idx), removed=np.setdiff1d(old_idx, idx[keep])))
+        return dropped
+
     def create_RRinterval_track(self):
+        """RR intervals (or HR) between consecutive annotations, updated as annotations are added or deleted"""
         db = Database.get()
-        to_HR = db.RR_interval_as_HR
-        track_fs = db.tracks[db.main_track_label].fs
-        track_ts = db.tracks[db.main_track_label].ts
-        closest_int_fs = int(min([np.ceil(1 / min(np.diff(self.x))), track_fs]))
-
-        fs = track_fs  # maximum zooming is defined by the lowest sampling freq of all tracks
-        rr_ts = np.arange(track_ts[0], track_ts[-1], 1 / fs)
-        new_ts_idx = np.arange(bisect.bisect_right(rr_ts, self.x[1]), bisect.bisect_left(rr_ts, self.x[-1]))
-        rr = np.zeros_like(rr_ts)
-
-        from gui.tracking import Wave
-        if to_HR:
-            rr[new_ts_idx] = np.interp(rr_ts[new_ts_idx], self.x[1:], 60 / np.diff(self.x))
-            rr_int_wave = Wave(rr, fs, rr_ts, offset=0, label='HR(' + self.name + ')', unit='BPM')
-            rr_int_wave.type = 'HR'
+        main_track = self.track()
+
+        from gui.tracking import Intervals
+        if db.RR_interval_as_HR:
+            rr_int_track = Intervals(self, main_track.fs, main_track.duration, as_rate=True, label='HR(' + self.name + ')', unit='BPM')
+            rr_int_track.type = 'HR'
         else:
-            rr[new_ts_idx] = np.interp(rr_ts[new_ts_idx], self.x[1:], np.diff(self.x))
-            rr_int_wave = Wave(rr, fs, rr_ts, offset=0, label='RR(' + self.name + ')', unit='sec')
-            rr_int_wave.type = 'RR'
+            rr_int_track = Intervals(self, main_track.fs, main_track.duration, label='RR(' + self.name + ')', unit='sec')
+            rr_int_track.type = 'RR'
 
-        return rr_int_wave
+        return rr_int_track
 
 
 class SingleFiducialConfig:
@@ -253,19 +295,18 @@ class SingleFiducialConfig:
         print(self.__str__())
 
     def set_annotation_from_time(self, ts, track):
-        # TODO: make it properly via init of Annotation(...)
         ts = ts[~np.isnan(ts)]
-        self.annotation.x = ts
-        idx, _, _ = find_closest(track.time, ts)
-        self.annotation.y = track.value[idx]
-        self.annotation.idx = idx
+        idx = track.find_nearest_sample(ts)
+        self.annotation.set_idx(idx)
 
     def set_annotation_from_idx(self, idx, track):
-        # TODO: make it properly via init of Annotation(...)
         idx = idx[~np.isnan(idx)]
-        self.annotation.idx = idx
-        self.annotation.x = track.time[idx]
-        self.annotation.y = track.value[idx]
+        self.annotation.set_idx(idx)
+
+    def repin_annotation(self) -> int:
+        """moves all annotations of this fiducial to its pinned_to peak or valley, :return: number of dropped annotations"""
+        return self.annotation.repin(Database.get().tracks[self.pinned_to_track_label], self.pinned_to_location, self.pinned_window,
+                                     self.min_distance)
 
 
 class AnnotationConfig(QObject):
@@ -0,0 +1,203 @@
+"""
+Copyright (c) 2020 Stichting imec Nederland (PALMS@imec.nl)
+https://www.imec-int.com/en/imec-the-netherlands
+@license GPL-3.0+ <http://spdx.org/licenses/GPL-3.0+>
+See COPYING, README.
+"""
+from abc import ABCMeta, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PyQt5.QtCore import qInfo
+
+
+class Edit(metaclass=ABCMeta):
+    """a recorded change which knows how to revert and re-apply itself"""
+    __slots__ = ()
+
+    @abstractmethod
+    def undo(self):
+        """reverts the change"""
+
+    @abstractmethod
+    def redo(self):
+        """re-applies the reverted change"""
+
+
+class AnnotationEdit(Edit):
+    """sample indices added to and removed from one fiducial"""
+    __slots__ = ('fiducial', 'added', 'removed')
+
+    def __init__(self, fiducial: str, added=(), removed=()):
+        self.fiducial = fiducial
+        self.added = np.asarray(added, dtype=np.int64)
+        self.removed = np.asarray(removed, dtype=np.int64)
+
+    def __str__(self):
+        return '{}: +{} -{}'.format(self.fiducial, self.added.size, self.removed.size)
+
+    def apply(self, added: np.ndarray, removed: np.ndarray):
+        from logic.operation_mode.annotation import AnnotationConfig
+        from gui.viewer import Viewer
+        AnnotationConfig.get()[self.fiducial].annotation.apply_edit(added, removed)
+        Viewer.get().selectedDisplayPanel.plot_area.refresh_fiducial(self.fiducial)
+
+    def undo(self):
+        self.apply(self.removed, self.added)
+
+    def redo(self):
+        self.apply(self.added, self.removed)
+
+
+class PartitionEdit(Edit):
+    """partition created (before is None), deleted (after is None) or moved from before to after (start, end)"""
+    __slots__ = ('name', 'before', 'after')
+
+    def __init__(self, name: str, before: Optional[Tuple[float, float]], after: Optional[Tuple[float, float]]):
+        self.name = name
+        self.before = before
+        self.after = after
+
+    def __str__(self):
+        return 'region {}: {} -> {}'.format(self.name, self.before, self.after)
+
+    def apply(self, frm: Optional[Tuple[float, float]], to: Optional[Tuple[float, float]]):
+        from logic.operation_mode.partitioning import Partitions, SinglePartition
+        if frm is None:
+            SinglePartition(self.name, start=to[0], end=to[1])
+        else:
+            p = Partitions.find_partition_by_point(frm[0] + (frm[1] - frm[0]) / 2)
+            assert p is not None and p.name == self.name, 'region {} [{:0.2f}; {:0.2f}] not found'.format(self.name, *frm)
+            if to is None:
+                p.region_deleted()
+            else:
+                # edits are undone in reverse order, so the neighbours are where they were and `to` is within bounds;
+                # setRegion emits sigRegionChangeFinished, which runs region_moved
+                p.setRegion(to)
+        Partitions.redraw()
+
+    def undo(self):
+        self.apply(self.after, self.before)
+
+    def redo(self):
+        self.apply(self.before, self.after)
+
+
+class EpochEdit(Edit):
+    """label code of one epoch changed"""
+    __slots__ = ('idx', 'old_code', 'new_code', 'old_is_modified')
+
+    def __init__(self, idx: int, old_code: int, new_code: int, old_is_modified: bool):
+        self.idx = idx
+        self.old_code = old_code
+        self.new_code = new_code
+        self.old_is_modified = old_is_modified
+
+    def __str__(self):
+        return 'epoch {}: {} -> {}'.format(self.idx, self.old_code, self.new_code)
+
+    def undo(self):
+        from logic.operation_mode.epoch_mode import EpochModeConfig
+        EpochModeConfig.get().restore_label(self.idx, self.old_code, self.old_is_modified)
+
+    def redo(self):
+        from logic.operation_mode.epoch_mode import EpochModeConfig
+        EpochModeConfig.get().restore_label(self.idx, self.new_code, True)
+
+
+class CompositeEdit(Edit):
+    """several edits undone and redone as one, e.g. all fiducials cleared from a region (see EditJournal.grouped)"""
+    __slots__ = ('edits',)
+
+    def __init__(self, edits: List[Edit]):
+        self.edits = edits
+
+    def __str__(self):
+        return ', '.join(str(edit) for edit in self.edits)
+
+    def undo(self):
+        for edit in reversed(self.edits):
+            edit.undo()
+
+    def redo(self):
+        for edit in self.edits:
+            edit.redo()
+
+
+class EditJournal:
+    """
+    static class keeping the undo/redo history of annotation, partition and epoch edits.
+    Only deltas are recorded (see Edit subclasses), the history is bounded by config['max_undo_steps'] and
+    undo/redo are O(1) apart from re-applying the edit itself
+    """
+    done: deque = None
+    undone: deque = None
+    is_paused = False
+    group: Optional[List[Edit]] = None
+
+    @staticmethod
+    def clear():
+        from gui import PALMS
+        EditJournal.done = deque(maxlen=PALMS.config['max_undo_steps'])
+        EditJournal.undone = deque(maxlen=PALMS.config['max_undo_steps'])
+
+    @staticmethod
+    def record(edit: Edit):
+        if EditJournal.is_paused:
+            return
+        if EditJournal.group is not None:
+            EditJournal.group.append(edit)
+            return
+        if EditJournal.done is None:
+            EditJournal.clear()
+        EditJournal.done.append(edit)
+        EditJournal.undone.clear()
+
+    @staticmethod
+    @contextmanager
+    def paused():
+        """edits made inside are not recorded, e.g. while an edit is undone or redone"""
+        was_paused, EditJournal.is_paused = EditJournal.is_paused, True
+        try:
+            yield
+        finally:
+            EditJournal.is_paused = was_paused
+
+    @staticmethod
+    @contextmanager
+    def grouped():
+        """edits made inside are recorded as one CompositeEdit, so that a single undo reverts all of them"""
+        if EditJournal.group is not None:  # nested, the outermost group records the edits
+            yield
+            return
+        EditJournal.group = []
+        try:
+            yield
+        finally:
+            edits, EditJournal.group = EditJournal.group, None
+            if edits:
+                EditJournal.record(edits[0] if len(edits) == 1 else CompositeEdit(edits))
+
+    @staticmethod
+    def undo():
+        if not EditJournal.done:
+            qInfo('Nothing to undo')
+            return
+        edit = EditJournal.done.pop()
+        with EditJournal.paused():
+            edit.undo()
+        EditJournal.undone.append(edit)
+        qInfo('Undo ' + str(edit))
+
+    @staticmethod
+    def redo():
+        if not EditJournal.undone:
+            qInfo('Nothing to redo')
+            return
+        edit = EditJournal.undone.pop()
+        with EditJournal.paused():
+            edit.redo()
+        EditJournal.done.append(edit)
+        qInfo('Redo ' + str(edit))
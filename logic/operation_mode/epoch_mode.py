@@ -16,6 +16,7 @@ from PyQt5 import QtCore, QtWidgets
 from PyQt5.QtCore import qInfo
 from PyQt5.QtGui import QFont
 
+from logic.operation_mode.edit_journal import EditJournal, EpochEdit
 from logic.operation_mode.operation_mode import Mode, Modes
 from utils.utils_gui import Dialog
 
@@ -27,7 +28,7 @@ class Index:
         self.idx = init_value
 
     def increase(self):
-        if self.idx < EpochModeConfig.get().window_data.shape[0] - 1:
+        if self.idx < len(EpochModeConfig.get().epochs) - 1:
             self.idx += 1
             return True
         else:
@@ -43,8 +44,8 @@ class Index:
     def set(self, idx):
         if idx < 0:
             self.idx = 0
-        elif idx > EpochModeConfig.get().window_data.shape[0] - 1:
-            self.idx = EpochModeConfig.get().window_data.shape[0] - 1
+        elif idx > len(EpochModeConfig.get().epochs) - 1:
+            self.idx = len(EpochModeConfig.get().epochs) - 1
         else:
             self.idx = int(idx)
 
@@ -52,6 +53,83 @@ class Index:
         return self.idx
 
 
+class EpochStore:
+    """
+    Labels of fixed-length contiguous epochs: one small int label code per epoch plus a modified flag.
+    Epoch start/end are derived from the window length, so lookup by x, labeling and navigation are O(1).
+    A DataFrame is only built on export, see to_dataframe
+    """
+
+    def __init__(self, t0: float, t_end: float, window_length: float, label_names: List[str], default_label: str):
+        self.t0, self.t_end, self.window_length = t0, t_end, window_length
+        self.label_names = list(label_names)  # code -> label, not extended after construction
+        if default_label not in self.label_names:
+            self.label_names.append(default_label)
+        self.codes = np.full(int(np.ceil((t_end - t0) / window_length)), self.code(default_label),
+                             dtype=np.int8 if len(self.label_names) < 128 else np.int16)
+        self.is_modified = np.zeros(self.codes.size, dtype=bool)
+
+    @classmethod
+    def from_arrays(cls, start: np.ndarray, end: np.ndarray, is_modified: np.ndarray, labels: List[str], label_names: List[str],
+                    window_length: float = None):
+        """restore saved epochs, which must be contiguous and of window_length, by default the length of the first epoch"""
+        start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+        assert start.size > 0 and start.size == end.size == len(labels) == len(is_modified), 'Every epoch should have start, end and label'
+        window_length = end[0] - start[0] if window_length is None else window_length
+        assert np.allclose(start, start[0] + np.arange(start.size) * window_length, rtol=0, atol=1e-6 * window_length), \
+            'Epochs should be contiguous and of the same length'
+        label_names = list(label_names) + [l for l in dict.fromkeys(labels) if l not in label_names]
+        store = cls(start[0], end[-1], window_length, label_names, label_names[0])
+        assert len(store) == start.size, 'Last epoch should not be longer than the others'
+        code_of = {l: c for c, l in enumerate(store.label_names)}
+        store.codes[:] = [code_of[l] for l in labels]
+        store.is_modified[:] = np.asarray(is_modified, dtype=bool)
+        return store
+
+    def __len__(self):
+        return self.codes.size
+
+    def code(self, label: str) -> int:
+        """code of a known label; label_names are fixed at construction, as the dtype of codes is chosen for their number"""
+        if label not in self.label_names:
+            raise ValueError(f'Unknown epoch label {label}')
+        return self.label_names.index(label)
+
+    def start(self, idx):
+        return self.t0 + idx * self.window_length
+
+    def end(self, idx):
+        return np.minimum(self.t0 + (np.asarray(idx) + 1) * self.window_length, self.t_end)
+
+    def idx_from_x(self, x: float) -> int:
+        return int(min(max((x - self.t0) // self.window_length, 0), len(self) - 1))
+
+    def range_between(self, x_min: float, x_max: float):
+        """[first, last) indices of epochs overlapping (x_min, x_max)"""
+        first = max(int((x_min - self.t0) // self.window_length), 0)
+        last = min(int(np.ceil((x_max - self.t0) / self.window_length)), len(self))
+        return first, max(first, last)
+
+    def label(self, idx: int) -> str:
+        return self.label_names[self.codes[idx]]
+
+    def set_label(self, idx: int, label: str):
+        self.codes[idx] = self.code(label)
+        self.is_modified[idx] = True
+
+    def starts(self) -> np.ndarray:
+        return self.start(np.arange(len(self)))
+
+    def ends(self) -> np.ndarray:
+        return self.end(np.arange(len(self)))
+
+    def labels(self) -> List[str]:
+        return list(np.array(self.label_names, dtype=object)[self.codes])
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame({'start': self.starts(), 'end': self.ends(), 'is_modified': self.is_modified.astype(int), 'label': self.labels()})
+
+
 class EpochModeConfig:
     _instance = None
     CURRENT_WINDOW_IDX = Index(0)
@@ -80,8 +158,7 @@ class EpochModeConfig:
 
         from logic.databases.DatabaseHandler import Database
         track = Database.get().tracks[Database.get().main_track_label]
-        self.window_data = pd.DataFrame(columns={'start', 'end', 'label'})
-        self.visuals = []
+        self.label_items = {}  # label -> pg.PlotDataItem, see self.label_item
         self.label_to_ypos = {}
         self.labels_to_keys = {}
         self.keys_to_labels = {}
@@ -96,15 +173,10 @@ class EpochModeConfig:
         self.keys = keys
         self.description = description
 
-        all_starts = np.arange(track.time[0], track.time[-1], self.window_length)
-        all_ends = all_starts + self.window_length
-        if all_ends[-1] > track.time[-1]:
-            all_ends[-1] = track.time[-1]
-
-        self.window_data['start'] = all_starts
-        self.window_data['end'] = all_ends
-        self.window_data['is_modified'] = 0
-        self.window_data['label'] = self.default_label
+        # when a time window is loaded, epochs stay on the grid of the whole file, so the first one may start before the window
+        t0 = track.time[0] - Database.get().window_start() % self.window_length
+        self.epochs = EpochStore(t0, track.time[-1], self.window_length, [EpochModeConfig.NONE_LABEL] + self.labels,
+                                 self.default_label)
 
         self.test_epoch_config()
 
@@ -125,6 +197,11 @@ class EpochModeConfig:
     def get(cls):
         return EpochModeConfig._instance
 
+    @property
+    def window_data(self) -> pd.DataFrame:
+        """all epochs as a DataFrame, built on every call: use for export only"""
+        return self.epochs.to_dataframe()
+
     def change_toggle_fiducials(self):
         """Option to show annotated fiducials in EpochMode or hide them"""
         from gui.plot_area import PlotArea
@@ -176,11 +253,9 @@ class EpochModeConfig:
             EpochModeConfig()
 
     @staticmethod
-    def load_from_hdf5(data: pd.DataFrame, keys: List[str], labels, default_label: str, NONE_LABEL: str, description: List[str]):
-        # TODO: check windows not overlap, cover whole signal, are of the same length
-        assert all([s in data.columns for s in EpochModeConfig.get().window_data]), 'Loaded epoch data misses some columns'
+    def load_from_hdf5(epochs: EpochStore, keys: List[str], labels, default_label: str, NONE_LABEL: str, description: List[str]):
         econfig = EpochModeConfig.get()
-        econfig.window_data = data
+        econfig.epochs = epochs
         econfig.labels = labels
         econfig.keys = keys
         econfig.default_label = default_label
@@ -190,23 +265,11 @@ class EpochModeConfig:
         return
 
     def get_window_idx_from_x(self, x_pos):
-        all_start = EpochModeConfig.get().window_data['start'].values
-        all_ends = EpochModeConfig.get().window_data['end'].values
-        if x_pos < 0:  # when starting the tool xrange has a margin
-            x_pos = 0
-        idx = np.where(np.bitwise_and(all_start <= x_pos, all_ends >= x_pos))[0][0]
-        return idx
+        return self.epochs.idx_from_x(x_pos)
 
     def get_window_data(self, idx: int):
-        if 0 <= idx < self.window_data.shape[0]:
-            st = self.window_data['start'].values[idx]
-            en = self.window_data['end'].values[idx]
-            label = self.window_data['label'].values[idx]
-            return st, en, label
-        elif idx < 0:
-            return self.get_window_data(0)
-        elif idx >= self.window_data.shape[0]:
-            return self.get_window_data(self.window_data.shape[0] - 1)
+        idx = min(max(idx, 0), len(self.epochs) - 1)
+        return self.epochs.start(idx), self.epochs.end(idx), self.epochs.label(idx)
 
     def test_epoch_config(self):
         assert len(self.labels) == len(self.keys), 'Length of labels and keys should be the same'
@@ -214,127 +277,74 @@ class EpochModeConfig:
         assert self.window_overlap == 0, 'Windows with overlap is not supported'
         assert isinstance(self.default_label, str), 'Default label should be a string'
 
-    @DeprecationWarning
-    def redraw_epochs2(self):
+    def label_item(self, label: str, vb: pg.ViewBox) -> pg.PlotDataItem:
+        """persistent item drawing all runs of the label as disconnected line segments, moved to vb if the main view has changed"""
+        item = self.label_items.get(label)
+        if item is None:
+            item = pg.PlotDataItem(name=label, connect='pairs',
+                                   pen=pg.mkPen(self.labels_to_color[label], width=3, style=QtCore.Qt.SolidLine, cosmetic=True))
+            self.label_items[label] = item
+        if item.getViewBox() is not vb:
+            if item.getViewBox() is not None:
+                item.getViewBox().removeItem(item)
+            vb.addItem(item)
+        return item
+
+    def relabel(self, idx: int, label: str):
+        """set the label of the idx-th epoch, recording the change for undo"""
+        old_code, old_is_modified = self.epochs.codes[idx], self.epochs.is_modified[idx]
+        self.epochs.set_label(idx, label)
+        EditJournal.record(EpochEdit(idx, int(old_code), int(self.epochs.codes[idx]), bool(old_is_modified)))
+
+    def restore_label(self, idx: int, code: int, is_modified: bool):
+        """set the label code of the idx-th epoch as recorded by EpochEdit and move the current window to it"""
+        old_label = self.epochs.label(idx)
+        self.epochs.codes[idx], self.epochs.is_modified[idx] = code, is_modified
+        EpochModeConfig.CURRENT_WINDOW_IDX.set(idx)
+        if EpochWindow.get() is not None:
+            EpochWindow.update_label()
+        self.redraw_epochs([old_label, self.epochs.label(idx)])
+
+    def redraw_epochs(self, labels: List[str] = None):
+        """
+        draw labeled epochs within the view span: consecutive epochs with the same label are merged into runs (run-length encoding),
+        all runs of a label are drawn by a single item. If labels are given, only their items are updated, e.g. after labeling one epoch
+        """
         from gui.plot_area import PlotArea
         main_view = PlotArea.get_main_view()
         if main_view is None:
             return
         vb = main_view.renderer.vb
-        for item in self.visuals:
-            vb.removeItem(item)
-        self.visuals.clear()
-        if Mode.mode in [Modes.epoch]:
-            x_min, x_max = vb.viewRange()[0]
-            y_min, y_max = vb.viewRange()[1]
-            y_max = y_max - 0.1 * (y_max - y_min)
-            y_min = y_min + 0.1 * (y_max - y_min)
-            y_range = y_max - y_min
-
-            self.label_to_ypos = {}
-            n_labels = len(self.labels)
-            for i in np.arange(n_labels):
-                self.label_to_ypos[self.labels[i]] = y_min + i * y_range / (n_labels - 1)
-
-            for i in np.arange(self.window_data.shape[0]):
-                label = self.window_data.loc[i, 'label']
-                st = self.window_data.loc[i, 'start']
-                en = self.window_data.loc[i, 'end']
-                if not label == EpochModeConfig.NONE_LABEL:
-                    y_pos = self.label_to_ypos[label]
-                    if not (st >= x_max or en <= x_min):
-                        line = pg.PlotDataItem(x=[st, en], y=[y_pos, y_pos], name=label,
-                                               pen=pg.mkPen(self.labels_to_color[label], width=3, style=QtCore.Qt.SolidLine, cosmetic=True))
-                        self.visuals.append(line)
-                        vb.addItem(line)
-
-    def redraw_epochs(self):
-        from gui.plot_area import PlotArea
-        main_view = PlotArea.get_main_view()
-        if main_view is None:
+        labels = self.labels if labels is None else [l for l in labels if l in self.labels]
+        if Mode.mode not in [Modes.epoch]:
+            for l in labels:
+                self.label_item(l, vb).setData(x=[], y=[])
             return
-        vb = main_view.renderer.vb
-        for item in self.visuals:
-            vb.removeItem(item)
-        self.visuals.clear()
-        if Mode.mode in [Modes.epoch]:
-            x_min, x_max = vb.viewRange()[0]
-            y_min, y_max = vb.viewRange()[1]
-            y_max = y_max - 0.1 * (y_max - y_min)
-            y_min = y_min + 0.1 * (y_max - y_min)
-            y_range = y_max - y_min
-
-            self.label_to_ypos = {}
-            n_labels = len(self.labels)
-            for i in np.arange(n_labels):
-                self.label_to_ypos[self.labels[i]] = y_min + i * y_range / (n_labels - 1)
-
-            # only for epoch in current view span
-            epoch_idxs = np.where(np.logical_and.reduce((self.window_data['start'].values < x_max, self.window_data['end'].values > x_min,
-                                                         )))[0]
-            # self.window_data['label'].values != EpochModeConfig.NONE_LABEL
-            # draw corresponding labels, but combine them into long single lines for speed optimization if labels are non changing
-            for i in epoch_idxs:
-                label = self.window_data.loc[i, 'label']
-                st = self.window_data.loc[i, 'start']
-                en = self.window_data.loc[i, 'end']
-
-                if i == epoch_idxs[0]:  # initialize
-                    prev_label = label
-                    line_start = st
-                    line_end = en
-
-                if label == EpochModeConfig.NONE_LABEL and prev_label != EpochModeConfig.NONE_LABEL:
-                    y_pos = self.label_to_ypos[prev_label]
-                    line = pg.PlotDataItem(x=[line_start, line_end], y=[y_pos, y_pos], name=prev_label,
-                                           pen=pg.mkPen(self.labels_to_color[prev_label], width=3, style=QtCore.Qt.SolidLine, cosmetic=True))
-                    self.visuals.append(line)
-                    vb.addItem(line)
-                    line_start = st
-                    line_end = en
-                    prev_label = label
-                    continue
-
-                if i == epoch_idxs[-1] and label == prev_label:  # last and label as prev --> draw the final line
-                    if prev_label == EpochModeConfig.NONE_LABEL:
-                        line_start = en
-                        prev_label = label
-                    else:
-                        line_end = en
-                        y_pos = self.label_to_ypos[prev_label]
-                        line = pg.PlotDataItem(x=[line_start, line_end], y=[y_pos, y_pos], name=prev_label,
-                                               pen=pg.mkPen(self.labels_to_color[prev_label], width=3, style=QtCore.Qt.SolidLine, cosmetic=True))
-                        self.visuals.append(line)
-                        vb.addItem(line)
-                elif not (i == epoch_idxs[-1]) and label == prev_label:  # NOT last and label as prev --> continue line
-                    line_end = en
-                elif not (i == epoch_idxs[
-                    -1]) and label != prev_label:  # NOT last and label NOT as prev --> draw the line up to this segment excluded and update for this segment
-                    if prev_label != EpochModeConfig.NONE_LABEL:
-                        y_pos = self.label_to_ypos[prev_label]
-                        line = pg.PlotDataItem(x=[line_start, line_end], y=[y_pos, y_pos], name=prev_label,
-                                               pen=pg.mkPen(self.labels_to_color[prev_label], width=3, style=QtCore.Qt.SolidLine, cosmetic=True))
-                        self.visuals.append(line)
-                        vb.addItem(line)
-                    line_start = st
-                    line_end = en
-                    prev_label = label
-                elif i == epoch_idxs[-1] and label != prev_label:  # last and label NOT as prev --> draw two lines
-                    if prev_label != EpochModeConfig.NONE_LABEL:
-                        y_pos = self.label_to_ypos[prev_label]
-                        line = pg.PlotDataItem(x=[line_start, line_end], y=[y_pos, y_pos], name=prev_label,
-                                               pen=pg.mkPen(self.labels_to_color[prev_label], width=3, style=QtCore.Qt.SolidLine, cosmetic=True))
-                        self.visuals.append(line)
-                        vb.addItem(line)
-
-                    line_start = st
-                    line_end = en
-                    prev_label = label
-                    y_pos = self.label_to_ypos[prev_label]
-                    line = pg.PlotDataItem(x=[line_start, line_end], y=[y_pos, y_pos], name=prev_label,
-                                           pen=pg.mkPen(self.labels_to_color[prev_label], width=3, style=QtCore.Qt.SolidLine, cosmetic=True))
-                    self.visuals.append(line)
-                    vb.addItem(line)
+
+        x_min, x_max = vb.viewRange()[0]
+        y_min, y_max = vb.viewRange()[1]
+        y_max = y_max - 0.1 * (y_max - y_min)
+        y_min = y_min + 0.1 * (y_max - y_min)
+        y_range = y_max - y_min
+
+        self.label_to_ypos = {}
+        n_labels = len(self.labels)
+        for i in np.arange(n_labels):
+            self.label_to_ypos[self.labels[i]] = y_min + i * y_range / max(n_labels - 1, 1)
+
+        # only for epoch in current view span
+        first, last = self.epochs.range_between(x_min, x_max)
+        epoch_codes = self.epochs.codes[first:last]
+
+        run_first = np.flatnonzero(np.r_[epoch_codes.size > 0, epoch_codes[1:] != epoch_codes[:-1]])
+        run_last = np.r_[run_first[1:], epoch_codes.size] - 1
+        run_codes = epoch_codes[run_first]
+        for l in labels:
+            is_label = run_codes == self.epochs.code(l)
+            x = np.empty(2 * np.count_nonzero(is_label))
+            x[0::2] = self.epochs.start(first + run_first[is_label])
+            x[1::2] = self.epochs.end(first + run_last[is_label])
+            self.label_item(l, vb).setData(x=x, y=np.full(x.size, self.label_to_ypos[l]))
 
     def process_keypress(self, key: str):
         """
@@ -345,10 +355,10 @@ class EpochModeConfig:
         label = self.keys_to_labels.get(key, EpochModeConfig.NONE_LABEL)
         if label is not EpochModeConfig.NONE_LABEL:
             idx = EpochModeConfig.CURRENT_WINDOW_IDX.get()
-            self.window_data.loc[idx, 'label'] = label
-            self.window_data.loc[idx, 'is_modified'] = 1
+            old_label = self.epochs.label(idx)
+            self.relabel(idx, label)
             EpochWindow.update_label()
-            self.redraw_epochs()
+            self.redraw_epochs([old_label, label])
 
             EpochWindow.move_right()
             qInfo('Window labeled {} '.format(label))
@@ -387,17 +397,16 @@ class EpochModeConfig:
         idx = EpochModeConfig.CURRENT_WINDOW_IDX.get()
 
         n_labels = len(self.labels)
-        this_label = self.window_data.loc[idx, 'label']
+        this_label = self.epochs.label(idx)
         if this_label == EpochModeConfig.NONE_LABEL:
             this_label_idx = -1
         else:
             this_label_idx = self.labels.index(this_label)
         if this_label_idx < n_labels - 1:
-            self.window_data.loc[idx, 'label'] = self.labels[this_label_idx + 1]
-            self.window_data.loc[idx, 'is_modified'] = 1
+            self.relabel(idx, self.labels[this_label_idx + 1])
 
             EpochWindow.update_label()
-            self.redraw_epochs()
+            self.redraw_epochs([this_label, self.labels[this_label_idx + 1]])
             # EpochWindow.move_right()
             qInfo('Window labeled {} '.format(self.labels[this_label_idx + 1]))
         else:
@@ -411,17 +420,16 @@ class EpochModeConfig:
         idx = EpochModeConfig.CURRENT_WINDOW_IDX.get()
 
         n_labels = len(self.labels)
-        this_label = self.window_data.loc[idx, 'label']
+        this_label = self.epochs.label(idx)
         if this_label == EpochModeConfig.NONE_LABEL:
             this_label_idx = n_labels
         else:
             this_label_idx = self.labels.index(this_label)
         if this_label_idx > 0:
-            self.window_data.loc[idx, 'label'] = self.labels[this_label_idx - 1]
-            self.window_data.loc[idx, 'is_modified'] = 1
+            self.relabel(idx, self.labels[this_label_idx - 1])
 
             EpochWindow.update_label()
-            self.redraw_epochs()
+            self.redraw_epochs([this_label, self.labels[this_label_idx - 1]])
             # EpochWindow.move_right()
             qInfo('Window labeled {} '.format(self.labels[this_label_idx - 1]))
         else:
@@ -429,6 +437,9 @@ class EpochModeConfig:
 
 
 class EpochWindow(pg.LinearRegionItem):
+    """
+    the current epoch: a single region and label, created once and moved in place when navigating between epochs
+    """
     _instance = None
 
     def __init__(self, name: str, *, start: float = None, end: float = None):
@@ -437,35 +448,41 @@ class EpochWindow(pg.LinearRegionItem):
         track = Database.get().tracks[Database.get().main_track_label]
 
         super().__init__((start, end))
-        self.setBounds([start, end])
         self.track = track
-        self.start = start
-        self.end = end
-        self.mid = self.start + (self.end - self.start) / 2
-        self.name = name
         self.label = pg.TextItem(name)
-
         self.label.setFont(QFont("", PALMS.config['epoch_labels_font_size'], QFont.Bold))
         self.label.setAnchor((0.5, 1))
         # self.label.setColor(QColor('k'))
+        self.set_window(name, start, end)
+
+        # self.sigRegionChangeFinished.connect(self.region_moved)
+        EpochWindow._instance = weakref.ref(self)()
 
+    def set_window(self, name: str, start: float, end: float):
+        self.setBounds([start, end])
+        self.setRegion((start, end))
+        self.start = start
+        self.end = end
+        self.mid = self.start + (self.end - self.start) / 2
+        self.name = name
+        self.label.setText(name)
         try:
             label_y = EpochModeConfig.get().label_to_ypos[name]
         except:
             label_y = self.track.get_yrange_between(self.start, self.end)[0]
         self.label.setPos(self.mid, label_y)
-
-        # self.sigRegionChangeFinished.connect(self.region_moved)
-        EpochWindow._instance = weakref.ref(self)()
         qInfo('Window at [{:0.2f}; {:0.2f}] '.format(self.start, self.end))
 
+    @staticmethod
+    def move_to_current_idx():
+        st, en, label = EpochModeConfig.get().get_window_data(EpochModeConfig.CURRENT_WINDOW_IDX.get())
+        EpochWindow.get().set_window(label, st, en)
+
     @staticmethod
     def move_current_window_to_x(x_pos):
         idx = EpochModeConfig.get().get_window_idx_from_x(x_pos)
         EpochModeConfig.CURRENT_WINDOW_IDX.set(idx)
-        st, en, label = EpochModeConfig.get().get_window_data(EpochModeConfig.CURRENT_WINDOW_IDX.get())
-        EpochWindow.hide()
-        EpochWindow(label, start=st, end=en)
+        EpochWindow.move_to_current_idx()
         EpochWindow.show()
 
     @staticmethod
@@ -476,22 +493,20 @@ class EpochWindow(pg.LinearRegionItem):
     def show():
         from gui.plot_area import PlotArea
         vb = PlotArea.get_main_view().renderer.vb
-        vb.addItem(EpochWindow.get())
-        vb.addItem(EpochWindow.get().label)
+        if EpochWindow.get().getViewBox() is not vb:
+            EpochWindow.hide()
+            vb.addItem(EpochWindow.get())
+            vb.addItem(EpochWindow.get().label)
 
     @staticmethod
     def hide():
-        from gui.plot_area import PlotArea
-        vb = PlotArea.get_main_view().renderer.vb
-        vb.removeItem(EpochWindow.get())
-        vb.removeItem(EpochWindow.get().label)
+        for item in [EpochWindow.get(), EpochWindow.get().label]:
+            if item.getViewBox() is not None:
+                item.getViewBox().removeItem(item)
 
     @staticmethod
     def update_label():
-        st, en, label = EpochModeConfig.get().get_window_data(EpochModeConfig.CURRENT_WINDOW_IDX.get())
-        EpochWindow.hide()
-        EpochWindow(label, start=st, end=en)
-        EpochWindow.show()
+        EpochWindow.move_to_current_idx()
 
     @staticmethod
     def is_out_of_scope():
@@ -507,38 +522,40 @@ class EpochWindow(pg.LinearRegionItem):
             return False
 
     @staticmethod
-    def move_right():
-        EpochWindow.hide()
-        from logic.databases.DatabaseHandler import Database
-        from gui.viewer import Viewer
+    def scroll_into_view():
+        """
+        translate the view once so that the window is within the view span. The shift is a whole number of 10% view steps,
+        so the result is the same as repeatedly stepping with Viewer.shiftRight/shiftLeft
+        """
+        if not EpochWindow.is_out_of_scope():
+            return
         from gui.plot_area import PlotArea
-        track = Database.get().tracks[Database.get().main_track_label]
-
-        success = EpochModeConfig.CURRENT_WINDOW_IDX.increase()
-        if success:
-            st, en, label = EpochModeConfig.get().get_window_data(EpochModeConfig.CURRENT_WINDOW_IDX.get())
-            EpochWindow(label, start=st, end=en)
-
-            while EpochWindow.is_out_of_scope():
-                Viewer.get().shiftRight()
+        from gui.viewer import Viewer
+        x_min, x_max = PlotArea.get_main_view().renderer.vb.viewRange()[0]
+        span = x_max - x_min
+        window = EpochWindow.get()
+        if window.end - window.start > span:  # window does not fit, align to its start
+            delta = window.start - x_min
+        elif window.end > x_max:
+            delta = np.ceil((window.end - x_max) / (span / 10)) * span / 10
+        else:
+            delta = -np.ceil((x_min - window.start) / (span / 10)) * span / 10
+        Viewer.get().translateBy(delta)
 
+    @staticmethod
+    def move_right():
+        from gui.plot_area import PlotArea
+        if EpochModeConfig.CURRENT_WINDOW_IDX.increase():
+            EpochWindow.move_to_current_idx()
+            EpochWindow.scroll_into_view()
         EpochWindow.show()
         PlotArea.get_main_view().renderer.plot_area.setFocus()
 
     @staticmethod
     def move_left():
-        EpochWindow.hide()
-        from logic.databases.DatabaseHandler import Database
-        from gui.viewer import Viewer
         from gui.plot_area import PlotArea
-        track = Database.get().tracks[Database.get().main_track_label]
-
-        success = EpochModeConfig.CURRENT_WINDOW_IDX.decrease()
-        if success:
-            st, en, label = EpochModeConfig.get().get_window_data(EpochModeConfig.CURRENT_WINDOW_IDX.get())
-            EpochWindow(label, start=st, end=en)
-            while EpochWindow.is_out_of_scope():
-                Viewer.get().shiftLeft()
-
+        if EpochModeConfig.CURRENT_WINDOW_IDX.decrease():
+            EpochWindow.move_to_current_idx()
+            EpochWindow.scroll_into_view()
         EpochWindow.show()
         PlotArea.get_main_view().renderer.plot_area.setFocus()
@@ -6,16 +6,18 @@ See COPYING, README.
 """
 
 import bisect
-from typing import List
+from typing import List, Tuple
 
 import numpy as np
 import pyqtgraph as pg
 import win32com
-from PyQt5.QtCore import QObject, qInfo, qWarning
+from PyQt5.QtCore import QObject, qInfo
 from PyQt5.QtGui import QFont, QColor
 from qtpy import QtWidgets
 from setuptools.package_index import unique_everseen
 
+from logic.operation_mode.edit_journal import EditJournal, PartitionEdit
+from logic.operation_mode.operation_mode import Mode
 from utils.utils_general import dict_to_df_with_nans
 from utils.utils_gui import Dialog
 
@@ -26,19 +28,24 @@ class SinglePartition(pg.LinearRegionItem):
     start\end can be dragged/moved in Partition mode, but cannot reach its limits
     """
 
-    def __init__(self, name: str, *, start: float = None, end: float = None):
+    def __init__(self, name: str, *, start: float = None, end: float = None, bounds: Tuple[float, float] = None):
         """
-        constructor when start/end are given explicitly. when created from mouse click (single point) see self.from_click
+        constructor when start/end are given explicitly. when created from mouse click (single point) see self.from_click.
+        If bounds are given, start/end are assumed to be valid already and the partition is not registered in Partitions,
+        which is used for bulk loading, see Partitions.add_all
         """
         from gui import PALMS
         from logic.databases.DatabaseHandler import Database
         track = Database.get().tracks[Database.get().main_track_label]
-        left_bound, right_bound = Partitions.calculate_boundaries(start, end)
-        left_bound = left_bound if left_bound is not None else track.minX
-        right_bound = right_bound if right_bound is not None else track.maxX
+        if bounds is None:
+            left_bound, right_bound = Partitions.calculate_boundaries(start, end)
+            left_bound = left_bound if left_bound is not None else track.minX
+            right_bound = right_bound if right_bound is not None else track.maxX
 
-        start = max([max([start, track.minX]), left_bound])
-        end = min([min([end, track.maxX]), right_bound])
+            start = max([max([start, track.minX]), left_bound])
+            end = min([min([end, track.maxX]), right_bound])
+        else:
+            left_bound, right_bound = bounds
 
         super().__init__((start, end))
         self.setBounds([left_bound, right_bound])
@@ -53,16 +60,20 @@ class SinglePartition(pg.LinearRegionItem):
         # self.label.setColor(QColor('k'))
         self.label.setAnchor((0.5, 1))
         self.label.setPos(self.mid, self.track.get_yrange_between(self.start, self.end)[0])
+        self.sigRegionChangeFinished.connect(self.region_moved)
+        if bounds is not None:
+            return
+
         Partitions.add(self)
 
-        Partitions.update_all_bounds(self)
+        Partitions.update_neighbour_bounds(self)
+        EditJournal.record(PartitionEdit(self.name, None, (self.start, self.end)))
 
         # # update config with new partition name
         # from gui.viewer import PALMS
         # PALMS.config['default_partition_labels'] = list(
         #     unique_everseen(PALMS.config['default_partition_labels'] + Partitions.unique_labels()))
 
-        self.sigRegionChangeFinished.connect(self.region_moved)
         qInfo('Region {} [{:0.2f}; {:0.2f}] created'.format(self.name, self.start, self.end))
 
     @classmethod
@@ -82,37 +93,82 @@ class SinglePartition(pg.LinearRegionItem):
         return cls(name, start=start, end=end)
 
     def region_moved(self):
+        before = (self.start, self.end)
         self.start, self.end = self.getRegion()
         self.mid = self.start + (self.end - self.start) / 2
         self.label.setPos(self.mid, self.track.get_yrange_between(self.start, self.end)[0])
-        Partitions.remove_zero_partitions()
-        Partitions.update_all_bounds()
+        Partitions.update(self)
+        if self.start == self.end:
+            EditJournal.record(PartitionEdit(self.name, before, None))  # undo restores the region as it was before collapsing
+            with EditJournal.paused():
+                self.region_deleted()
+            return
+        Partitions.update_neighbour_bounds(self)
+        if before != (self.start, self.end):
+            EditJournal.record(PartitionEdit(self.name, before, (self.start, self.end)))
         qInfo('Region {} moved'.format(self.name))
 
     def region_deleted(self):
         if self is not None:
-            self.label.getViewBox().removeItem(self.label)
-            self.getViewBox().removeItem(self)
-            Partitions.delete(self)
-            Partitions.update_all_bounds()
+            Partitions.remove_items(self)
+            idx = Partitions.delete(self)
+            Partitions.update_bounds(range(idx - 1, idx + 1))  # former neighbours
+            EditJournal.record(PartitionEdit(self.name, (self.start, self.end), None))
             qInfo('Region {} [{:0.2f}; {:0.2f}] deleted'.format(self.name, self.start, self.end))
 
 
 class Partitions(QObject):
     """
-    static class to operate on all existing SinglePartition instances
+    static class to operate on all existing SinglePartition instances.
+    Partitions do not overlap, so sorting by start sorts by end as well: neighbours are found by bisection of
+    the start/end arrays, which are kept in sync with the list on every add/move/delete
     """
     partitions: List[SinglePartition] = []  # keep sorted list of all SinglePartition instances
+    starts: np.ndarray = np.array([])
+    ends: np.ndarray = np.array([])
+    shown = True  # see unhide_all_partitions\hide_all_partitions
+    materialized: List[SinglePartition] = []  # partitions with region\label items currently in the scene
+    summary: pg.BarGraphItem = None  # lightweight layer drawing partitions when too many of them are in view
 
     def __new__(*args):  # instead of creating, return list of SinglePartition
         return Partitions.partitions
 
     @staticmethod
     def remove_zero_partitions():  # if start==end --> SinglePartition is flat
-        for p in Partitions():
-            x1, x2 = p.getRegion()
-            if x1 == x2:
-                p.region_deleted()
+        for idx in np.flatnonzero(Partitions.starts == Partitions.ends)[::-1]:
+            Partitions.partitions[idx].region_deleted()
+
+    @staticmethod
+    def index(p: SinglePartition) -> int:
+        """
+        position of p in the sorted list. While p is being moved its start/end can be out of sync with the arrays,
+        but bounds keep it between its neighbours, so it is found next to the bisection point
+        """
+        idx = bisect.bisect_left(Partitions.ends, p.end)
+        for i in (idx, idx - 1, idx + 1):
+            if 0 <= i < len(Partitions.partitions) and Partitions.partitions[i] is p:
+                return i
+        return next(i for i, q in enumerate(Partitions.partitions) if q is p)
+
+    @staticmethod
+    def bounds(idx: int):
+        """limits to which the idx-th SinglePartition can be moved\dragged: borders of its neighbours or the track limits"""
+        p = Partitions.partitions[idx]
+        left_bound = Partitions.ends[idx - 1] if idx > 0 else p.track.minX
+        right_bound = Partitions.starts[idx + 1] if idx + 1 < len(Partitions.partitions) else p.track.maxX
+        return left_bound, right_bound
+
+    @staticmethod
+    def update_bounds(indices):
+        for idx in indices:
+            if 0 <= idx < len(Partitions.partitions):
+                Partitions.partitions[idx].setBounds(list(Partitions.bounds(idx)))
+
+    @staticmethod
+    def update_neighbour_bounds(p: SinglePartition):
+        """after p was created\moved, only the limits of its left and right neighbours change"""
+        idx = Partitions.index(p)
+        Partitions.update_bounds([idx - 1, idx + 1])
 
     @staticmethod
     def update_all_bounds(avoid_this_p: SinglePartition = None):
@@ -120,98 +176,160 @@ class Partitions(QObject):
         As SinglePartitions cannot overlap, after creating\moving\deleting it is necessary to update
         the limits to which every SinglePartition can be moved\dragged
         """
-        for p in Partitions():
-            if not p == avoid_this_p:
-                left_bound, right_bound = Partitions.calculate_boundaries(p.start, p.end)
-                left_bound = left_bound if left_bound is not None else p.track.minX
-                right_bound = right_bound if right_bound is not None else p.track.maxX
-                p.setBounds([left_bound, right_bound])
+        Partitions.update_bounds([idx for idx, p in enumerate(Partitions.partitions) if p is not avoid_this_p])
 
     @staticmethod
     def calculate_boundaries(this_left: float, this_right: float):
         """
         check nearest left and nearest right SinglePartition borders and set limits for this SinglePartition
         """
-        nearest_left = bisect.bisect_right(Partitions.all_endpoints(), this_left) - 1
-        nearest_right = bisect.bisect_left(Partitions.all_startpoints(), this_right)
-        try:
-            left_boundary = Partitions()[nearest_left].end if nearest_left >= 0 else None
-        except:
-            left_boundary = None
-
-        try:
-            right_boundary = Partitions()[nearest_right].start if nearest_right >= 0 else None
-        except:
-            right_boundary = None
-
+        nearest_left = bisect.bisect_right(Partitions.ends, this_left) - 1
+        nearest_right = bisect.bisect_left(Partitions.starts, this_right)
+        left_boundary = Partitions.ends[nearest_left] if nearest_left >= 0 else None
+        right_boundary = Partitions.starts[nearest_right] if nearest_right < Partitions.starts.size else None
         return left_boundary, right_boundary
 
     @staticmethod
     def unhide_all_partitions():
-        from gui.viewer import Viewer
-        for i in Partitions():
-            Viewer.get().selectedView.renderer.vb.addItem(i)
-            Viewer.get().selectedView.renderer.vb.addItem(i.label)
+        Partitions.shown = True
+        Partitions.redraw()
 
     @staticmethod
     def hide_all_partitions():
+        Partitions.shown = False
+        Partitions.redraw()
+
+    @staticmethod
+    def remove_items(p: SinglePartition):
+        for item in [p, p.label]:
+            if item.getViewBox() is not None:
+                item.getViewBox().removeItem(item)
+
+    @staticmethod
+    def redraw():
+        """
+        only partitions within the view range are added to the scene as draggable regions, so the scene size is bounded.
+        When more than config['max_partition_items'] partitions are in view, all of them are drawn by a single summary item instead
+        """
+        from gui import PALMS
         from gui.viewer import Viewer
-        for i in Partitions():
-            Viewer.get().selectedView.renderer.vb.removeItem(i)
-            Viewer.get().selectedView.renderer.vb.removeItem(i.label)
+        if Viewer.get() is None or Viewer.get().selectedView is None:
+            return
+        vb = Viewer.get().selectedView.renderer.vb
+        first, last = 0, 0
+        if Partitions.shown:
+            x_min, x_max = vb.viewRange()[0]
+            first, last = np.searchsorted(Partitions.ends, x_min, 'left'), np.searchsorted(Partitions.starts, x_max, 'right')
+        use_summary = last - first > PALMS.config['max_partition_items']
+        in_view = [] if use_summary else Partitions.partitions[first:last]
+
+        in_view_ids = {id(p) for p in in_view}
+        for p in Partitions.materialized:
+            if id(p) not in in_view_ids:
+                Partitions.remove_items(p)
+        for p in in_view:
+            if p.getViewBox() is not vb:
+                Partitions.remove_items(p)
+                vb.addItem(p, ignoreBounds=True)  # partitions never define the data range of the plot
+                vb.addItem(p.label, ignoreBounds=True)
+        Partitions.materialized = list(in_view)
+
+        if use_summary:
+            track = Partitions.partitions[0].track
+            if Partitions.summary is None:  # created once, only its bars are updated afterwards
+                Partitions.summary = pg.BarGraphItem(x0=[], width=[], y0=0, height=1, brush=(0, 0, 255, 50), pen=None)
+            if Partitions.summary.getViewBox() is not vb:
+                if Partitions.summary.getViewBox() is not None:
+                    Partitions.summary.getViewBox().removeItem(Partitions.summary)
+                vb.addItem(Partitions.summary, ignoreBounds=True)
+            Partitions.summary.setOpts(x0=Partitions.starts[first:last], width=Partitions.ends[first:last] - Partitions.starts[first:last],
+                                       y0=track.minY, height=track.maxY - track.minY)
+        if Partitions.summary is not None:
+            Partitions.summary.setVisible(use_summary)
 
     @staticmethod
     def add(p: SinglePartition):
-        idx = bisect.bisect_left(Partitions.all_midpoints(), p.mid)
+        idx = bisect.bisect_left(Partitions.starts, p.start)
         Partitions.partitions.insert(idx, p)
+        Partitions.starts = np.insert(Partitions.starts, idx, p.start)
+        Partitions.ends = np.insert(Partitions.ends, idx, p.end)
+
+    @staticmethod
+    def update(p: SinglePartition):
+        """sync start/end arrays after p was moved. Bounds keep p between its neighbours, so the order does not change"""
+        idx = Partitions.index(p)
+        Partitions.starts[idx], Partitions.ends[idx] = p.start, p.end
 
     @staticmethod
     def add_all(labels: List[str], start: np.ndarray, end: np.ndarray):
         """
-        batch adding partitions, e.g. from loaded annotations file
-
+        batch adding partitions, e.g. from loaded annotations file: validated and bounded all at once,
+        instead of registering every partition and updating all bounds after each of them
         """
         try:
             Partitions.delete_all()
+            start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
             assert len(labels) == start.size & start.size == end.size, 'Every loaded partition should have label, start and end'
-            for l, s, e in zip(labels, start, end):
-                SinglePartition(l, start=s, end=e)
+            from logic.databases.DatabaseHandler import Database
+            track = Database.get().tracks[Database.get().main_track_label]
+            order = np.argsort(start, kind='stable')
+            labels = [labels[i] for i in order]
+            start, end = np.clip(start[order], track.minX, track.maxX), np.clip(end[order], track.minX, track.maxX)
+            assert np.all(start <= end), 'Every loaded partition should start before it ends'
+            overlap = np.flatnonzero(start[1:] < end[:-1])
+            assert overlap.size == 0, 'Loaded partitions overlap, e.g. at {:0.2f} s'.format(start[overlap[0] + 1])
+
+            left_bounds = np.r_[track.minX, end[:-1]]
+            right_bounds = np.r_[start[1:], track.maxX]
+            Partitions.partitions = [SinglePartition(l, start=s, end=e, bounds=(lb, rb))
+                                     for l, s, e, lb, rb in zip(labels, start, end, left_bounds, right_bounds)]
+            Partitions.starts, Partitions.ends = start, end
+            qInfo('{} regions loaded'.format(len(labels)))
+            if not Mode.is_epoch_mode():
+                Partitions.unhide_all_partitions()
         except Exception as e:
             Dialog().warningMessage('Partitions cannot be loaded\r\n' + str(e))
 
     @staticmethod
-    def delete(p: SinglePartition):
-        Partitions.partitions.remove(p)
+    def delete(p: SinglePartition) -> int:
+        """:return: index p had in the sorted list"""
+        idx = Partitions.index(p)
+        del Partitions.partitions[idx]
+        Partitions.starts = np.delete(Partitions.starts, idx)
+        Partitions.ends = np.delete(Partitions.ends, idx)
+        return idx
 
     @staticmethod
     def delete_all():
-        Partitions.hide_all_partitions()
+        for p in Partitions.materialized:
+            Partitions.remove_items(p)
+        Partitions.materialized = []
         Partitions.partitions = []
+        Partitions.starts, Partitions.ends = np.array([]), np.array([])
+        Partitions.redraw()
 
     @staticmethod
     def find_partition_by_point(click_x: float):  # get partition under mouse click or None
-        idx = np.where((click_x >= Partitions.all_startpoints()) & (click_x <= Partitions.all_endpoints()))[0]
-        if len(idx) == 1:
-            return Partitions()[idx[0]]
-        elif len(idx) == 0:
-            return None
-        else:
-            qWarning('More than one partition found! Return the first')  # should not happen, as partitions don't overlap
-            return Partitions()[idx[0]]
+        idx = bisect.bisect_right(Partitions.starts, click_x) - 1
+        if idx > 0 and Partitions.ends[idx - 1] >= click_x:  # click on the border of two adjacent partitions, return the first
+            return Partitions()[idx - 1]
+        if idx >= 0 and Partitions.ends[idx] >= click_x:
+            return Partitions()[idx]
+        return None
 
     # TODO: ensure non overlapping partitions!!!
     # TODO: partitions outside signal
     @staticmethod
     def all_startpoints():
-        return np.array([p.start for p in Partitions.partitions])
+        return Partitions.starts.copy()
 
     @staticmethod
     def all_endpoints():
-        return np.array([p.end for p in Partitions.partitions])
+        return Partitions.ends.copy()
 
     @staticmethod
     def all_midpoints():
-        return np.array([p.mid for p in Partitions.partitions])
+        return Partitions.starts + (Partitions.ends - Partitions.starts) / 2
 
     @staticmethod
     def all_labels():
@@ -246,18 +364,16 @@ class Partitions(QObject):
             from logic.operation_mode.annotation import AnnotationConfig
             from gui.viewer import Viewer
             aConf = AnnotationConfig.get()
-            for f in aConf.fiducials:
-                ann = f.annotation
-                remove_idx = np.arange(bisect.bisect_right(ann.x, p.start), bisect.bisect_left(ann.x, p.end))
-                nn = max(remove_idx.shape)
-                result = QtWidgets.QMessageBox.question(Viewer.get(), "Confirm Delete Annotations...",
-                                                        "Are you sure you want to delete {nn} {name} annotations ?".format(nn=nn, name=ann.name),
-                                                        QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
-                if result == QtWidgets.QMessageBox.Yes:
-                    ann.x = np.delete(ann.x, remove_idx)
-                    ann.y = np.delete(ann.y, remove_idx)
-                    ann.idx = np.delete(ann.idx, remove_idx)
-                    Viewer.get().selectedDisplayPanel.plot_area.redraw_fiducials()
+            with EditJournal.grouped():  # one undo restores all fiducials cleared here
+                for f in aConf.fiducials:
+                    ann = f.annotation
+                    nn = len(ann.find_annotation_between_two_ts(p.start, p.end)[0])
+                    result = QtWidgets.QMessageBox.question(Viewer.get(), "Confirm Delete Annotations...",
+                                                            "Are you sure you want to delete {nn} {name} annotations ?".format(nn=nn, name=ann.name),
+                                                            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
+                    if result == QtWidgets.QMessageBox.Yes:
+                        ann.remove_between(p.start, p.end)
+                        Viewer.get().selectedDisplayPanel.plot_area.redraw_fiducials()
             Partitions.update_all_bounds()
 
         except Exception as e:
@@ -0,0 +1,43 @@
+"""
+Copyright (c) 2020 Stichting imec Nederland (PALMS@imec.nl)
+https://www.imec-int.com/en/imec-the-netherlands
+@license GPL-3.0+ <http://spdx.org/licenses/GPL-3.0+>
+See COPYING, README.
+"""
+from typing import Callable, Dict, Hashable
+
+from PyQt5 import QtCore
+
+from utils.utils_gui import Dialog
+
+
+class RedrawScheduler(QtCore.QObject):
+    """
+    Coalesces redraw requests of plot layers (waveforms, fiducials, y-range, epochs, partitions).
+    A layer marked dirty several times before the next frame is redrawn only once, with the latest state,
+    so a burst of range changes (e.g. fast wheel zooming) costs one redraw per frame instead of one per event
+    """
+
+    def __init__(self, parent=None, fps: int = 60):
+        super().__init__(parent)
+        self._dirty: Dict[Hashable, Callable] = {}  # layer key -> redraw callback, in the order they were marked
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(1000 // fps)
+        self._timer.timeout.connect(self.flush)
+
+    def mark_dirty(self, layer: Hashable, redraw: Callable):
+        """redraw the layer on the next frame"""
+        self._dirty[layer] = redraw
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        """redraw all dirty layers now"""
+        self._timer.stop()
+        dirty, self._dirty = self._dirty, {}
+        for layer, redraw in dirty.items():
+            try:
+                redraw()
+            except Exception as e:
+                Dialog().warningMessage('Redrawing {} failed\r\n'.format(layer) + str(e))
@@ -0,0 +1,96 @@
+"""
+Copyright (c) 2020 Stichting imec Nederland (PALMS@imec.nl)
+https://www.imec-int.com/en/imec-the-netherlands
+@license GPL-3.0+ <http://spdx.org/licenses/GPL-3.0+>
+See COPYING, README.
+
+Micro-benchmarks of the plotting path, run with:
+    python -m utils.benchmarks
+"""
+import time
+
+import numpy as np
+
+from utils.decimation import get_decimator_classes
+from utils.signal_index import MinMaxPyramid
+from utils.utils_general import find_closest
+
+
+class _Signal:
+    """the part of gui.tracking.Wave used by the decimators, without the need of a running PALMS instance"""
+
+    def __init__(self, value: np.ndarray, fs: int):
+        self.fs = fs
+        self.viewvalue = value
+        self.lod = MinMaxPyramid(value)
+
+
+def synthetic_ppg(fs: int = 250, hours: float = 12, seed: int = 0) -> np.ndarray:
+    """PPG-like signal: ~70 bpm pulses with sharp systolic peaks, respiration baseline wander and noise"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(hours * 3600 * fs)) / fs
+    phase = 2 * np.pi * np.cumsum(1.15 + 0.1 * np.sin(2 * np.pi * t / 60)) / fs
+    pulse = np.exp(-((np.mod(phase, 2 * np.pi) - 1) ** 2) * 8)
+    return pulse + 0.2 * np.sin(2 * np.pi * 0.25 * t) + 0.02 * rng.standard_normal(t.size)
+
+
+def visual_error(x_raw: np.ndarray, y_raw: np.ndarray, x: np.ndarray, y: np.ndarray, width: int) -> float:
+    """
+    mean difference between the min/max envelopes of the raw and the decimated polyline per pixel column,
+    in % of the signal range. 0 means the plots are identical at this screen width
+    """
+    edges = np.linspace(x_raw[0], x_raw[-1], width + 1)
+    raw_cols = np.clip(np.searchsorted(x_raw, edges[:-1]), 0, len(x_raw) - 1)
+    raw_lo, raw_hi = np.minimum.reduceat(y_raw, raw_cols), np.maximum.reduceat(y_raw, raw_cols)
+
+    edge_y = np.interp(edges, x, y)  # lines crossing a column contribute to its envelope as well
+    lo, hi = np.minimum(edge_y[:-1], edge_y[1:]), np.maximum(edge_y[:-1], edge_y[1:])
+    cols = np.clip(np.searchsorted(edges, x, side='right') - 1, 0, width - 1)
+    np.minimum.at(lo, cols, y)
+    np.maximum.at(hi, cols, y)
+    err = (np.abs(lo - raw_lo) + np.abs(hi - raw_hi)) / 2
+    return 100 * err.mean() / (y_raw.max() - y_raw.min())
+
+
+def bench_decimation(fs: int = 250, hours: float = 12, width: int = 1920, repeat: int = 5):
+    value = synthetic_ppg(fs, hours)
+    t0 = time.perf_counter()
+    signal = _Signal(value, fs)
+    print('{} samples, pyramid built in {:.3f} s'.format(value.size, time.perf_counter() - t0))
+    windows = {'overview': (0, value.size), '10 min': (value.size // 2, value.size // 2 + 600 * fs),
+               '30 s': (value.size // 2, value.size // 2 + 30 * fs)}
+    print('{:<10}{:<10}{:>14}{:>10}{:>12}{:>16}'.format('mode', 'window', 'samples/s', 'points', 'error, %', 'pan samples/s'))
+    for decimator_class in get_decimator_classes():
+        for window, (start, stop) in windows.items():
+            ds = (stop - start) / width
+            decimator = decimator_class()
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                x, y = decimator.decimate(signal, start, stop, ds)
+            elapsed = (time.perf_counter() - t0) / repeat
+
+            step = (stop - start) // 20  # pan by 5% of the window
+            t0 = time.perf_counter()
+            for i in range(repeat * 4):
+                decimator.decimate(signal, start + i * step, stop + i * step, ds)
+            pan_elapsed = (time.perf_counter() - t0) / (repeat * 4)
+
+            err = visual_error(np.arange(start, stop) / fs, value[start:stop], x, y, width)
+            print('{:<10}{:<10}{:>14.3g}{:>10}{:>12.3f}{:>16.3g}'.format(decimator.name, window, (stop - start) / elapsed, len(y), err,
+                                                                         (stop - start) / pan_elapsed))
+
+
+def bench_find_closest(fs: int = 250, hours: float = 24, n_annotations: int = 100000, repeat: int = 5):
+    """mapping annotation timestamps to samples, as done when annotations are loaded"""
+    ts = np.arange(int(hours * 3600 * fs)) / fs
+    targets = np.sort(np.random.default_rng(0).uniform(ts[0], ts[-1], n_annotations))
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        find_closest(ts, targets)
+    print('find_closest: {} timestamps on {} samples in {:.2f} ms'.format(n_annotations, ts.size,
+                                                                        1000 * (time.perf_counter() - t0) / repeat))
+
+
+if __name__ == '__main__':
+    bench_decimation()
+    bench_find_closest()
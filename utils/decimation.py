@@ -0,0 +1,119 @@
+"""
+Copyright (c) 2020 Stichting imec Nederland (PALMS@imec.nl)
+https://www.imec-int.com/en/imec-the-netherlands
+@license GPL-3.0+ <http://spdx.org/licenses/GPL-3.0+>
+See COPYING, README.
+"""
+from abc import ABCMeta, abstractmethod
+from typing import List, Tuple, Type
+
+import numpy as np
+
+from utils.signal_index import DecimationCache
+
+
+class Decimator(metaclass=ABCMeta):
+    """
+    Reduces samples [start, stop) of a Wave to a few points per pixel column of ds samples (may be fractional) for plotting.
+    Every Waveform renderer holds its own instance, so decimators may keep state (e.g. a cache) between redraws
+    """
+    name = 'metaclass'
+
+    def __str__(self) -> str:
+        return self.name
+
+    @abstractmethod
+    def decimate(self, track, start: int, stop: int, ds: float) -> Tuple[np.ndarray, np.ndarray]:
+        """:return: x in seconds, y"""
+
+
+class MinMax(Decimator):
+    """min and max of each bucket: cheapest mode which still shows every peak"""
+    name = 'min/max'
+
+    def __init__(self):
+        self.cache = DecimationCache()
+
+    def decimate(self, track, start: int, stop: int, ds: float) -> Tuple[np.ndarray, np.ndarray]:
+        x, y = self.cache.decimate(track.lod, start, stop, ds)
+        return x / track.fs, y
+
+
+class M4(Decimator):
+    """
+    first, min, max and last of each pixel column (Jugel et al., M4: a visualization-oriented time series data aggregation).
+    Compared to min/max, the lines between adjacent pixel columns start and end at the right values
+    """
+    name = 'M4'
+
+    def __init__(self):
+        self.cache = DecimationCache()
+
+    def decimate(self, track, start: int, stop: int, ds: float) -> Tuple[np.ndarray, np.ndarray]:
+        extrema, minmax = self.cache.decimate(track.lod, start, stop, ds)
+        col = ((extrema[0::2] - start) / ds).astype(np.int64)
+        c_start = np.minimum(start + np.ceil(col * ds).astype(np.int64), extrema[0::2])
+        c_stop = np.minimum(start + np.ceil((col + 1) * ds).astype(np.int64), min(stop, track.lod.size))
+        c_end = np.maximum(c_stop - 1, extrema[1::2])
+        x = np.empty(4 * col.size, dtype=np.int64)
+        x[0::4], x[1::4], x[2::4], x[3::4] = c_start, extrema[0::2], extrema[1::2], c_end
+        y = np.empty(4 * col.size, dtype=minmax.dtype)
+        y[0::4], y[1::4], y[2::4], y[3::4] = track.viewvalue[c_start], minmax[0::2], minmax[1::2], track.viewvalue[c_end]
+        return x / track.fs, y
+
+
+class LTTB(Decimator):
+    """
+    Largest-Triangle-Three-Buckets (Steinarsson, Downsampling time series for visual representation).
+    Keeps the visual shape with 2 points per bucket, but is sequential and therefore the most expensive mode.
+    Long windows are first reduced with min/max to `preselect` candidates per output point
+    """
+    name = 'LTTB'
+    preselect = 8
+
+    def __init__(self):
+        self.cache = DecimationCache()
+
+    def decimate(self, track, start: int, stop: int, ds: float) -> Tuple[np.ndarray, np.ndarray]:
+        n_out = 2 * max(1, int((stop - start) // ds))
+        candidates_ds = ds / (self.preselect // 2)
+        if candidates_ds > 1:
+            x, y = self.cache.decimate(track.lod, start, stop, candidates_ds)
+            x = x / track.fs
+        else:
+            y = track.viewvalue[start:stop]
+            x = np.arange(start, start + len(y)) / track.fs
+        keep = lttb(x, y, n_out)
+        return x[keep], y[keep]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """:return: indices of the n_out points of (x, y) selected by Largest-Triangle-Three-Buckets"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    y = y.astype(float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)  # first and last points are always kept
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(hi, edges[i + 2]) if i + 2 < len(edges) else slice(n - 1, n)
+        cx, cy = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def get_decimator_classes() -> List[Type[Decimator]]:
+    """first decimator is the default one"""
+    return [MinMax, M4, LTTB]
+
+
+def get_decimator(name: str) -> Decimator:
+    try:
+        return next(d for d in get_decimator_classes() if d.name == name)()
+    except StopIteration:
+        raise ValueError('Unknown decimation mode {}'.format(name))
@@ -0,0 +1,520 @@
+"""
+Copyright (c) 2020 Stichting imec Nederland (PALMS@imec.nl)
+https://www.imec-int.com/en/imec-the-netherlands
+@license GPL-3.0+ <http://spdx.org/licenses/GPL-3.0+>
+See COPYING, README.
+"""
+import bisect
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.signal import find_peaks, peak_prominences
+
+
+class ChunkedArray:
+    """
+    Read-only 1D view of an on-disk array, e.g. an h5py.Dataset of a -v7.3 mat file (or any source with shape, dtype
+    and slicing), which reads only the requested samples. Single channel sources of shape (n, 1) or (1, n) are accepted.
+    Whole-signal passes go block by block through blocks(); np.asarray() reads the full signal into memory
+    """
+    ndim = 1
+
+    def __init__(self, source, dtype=None, block_size: Optional[int] = None):
+        shape = tuple(source.shape)
+        assert len(shape) >= 1 and sum(d > 1 for d in shape) <= 1, 'only a single channel is supported'
+        self.source = source
+        self.axis = int(np.argmax(shape))
+        self.size = shape[self.axis]
+        self.dtype = np.dtype(dtype or source.dtype)
+        if block_size is None:  # whole storage chunks of ~1M samples
+            chunks = getattr(source, 'chunks', None)
+            chunk = chunks[self.axis] if chunks else 1
+            block_size = max(1, 2 ** 20 // chunk) * chunk
+        self.block_size = block_size
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def shape(self) -> Tuple[int]:
+        return self.size,
+
+    def astype(self, dtype, copy=True):
+        """samples are converted when they are read"""
+        return ChunkedArray(self.source, dtype, self.block_size)
+
+    def _read(self, start: int, stop: int, step: int = 1) -> np.ndarray:
+        if start >= stop:
+            return np.empty(0, dtype=self.dtype)
+        key = [0] * len(self.source.shape)
+        key[self.axis] = slice(start, stop, step)
+        return np.asarray(self.source[tuple(key)], dtype=self.dtype).reshape(-1)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.size)
+            if step > 0:
+                return self._read(start, stop, step)
+            key = np.arange(start, stop, step)
+        elif np.ndim(key) == 0:
+            i = int(key)
+            if not -self.size <= i < self.size:
+                raise IndexError('index {} is out of bounds for a signal of size {}'.format(key, self.size))
+            return self._read(i % self.size, i % self.size + 1)[0]
+        key = np.asarray(key)
+        i = np.flatnonzero(key) if key.dtype == bool else key.astype(np.int64)
+        if not i.size:
+            return np.empty(i.shape, dtype=self.dtype)
+        if not (-self.size <= i.min() and i.max() < self.size):
+            raise IndexError('index out of bounds for a signal of size {}'.format(self.size))
+        # samples closer than a block to each other are read with one slice
+        u, inverse = np.unique(i % self.size, return_inverse=True)
+        runs = np.split(u, np.flatnonzero(np.diff(u) > self.block_size) + 1)
+        y = np.concatenate([self._read(r[0], r[-1] + 1)[r - r[0]] for r in runs])
+        return y[inverse.reshape(i.shape)]
+
+    def __array__(self, dtype=None, copy=None):
+        y = np.concatenate([y for _, y in self.blocks()] or [np.empty(0, dtype=self.dtype)])
+        return y.astype(dtype or self.dtype, copy=False)
+
+    def blocks(self, multiple: int = 1):
+        """yields (start, samples) of consecutive blocks covering the signal, block sizes are a multiple of `multiple`"""
+        step = -(-self.block_size // multiple) * multiple
+        for start in range(0, self.size, step):
+            yield start, self._read(start, min(self.size, start + step))
+
+
+class _ReducedLevel:
+    """a min or max level of MinMaxPyramid of an out-of-core signal which is reduced from the signal on access"""
+
+    def __init__(self, values: ChunkedArray, block: int, ufunc: np.ufunc):
+        self.values, self.block, self.ufunc = values, block, ufunc
+        self.dtype = values.dtype
+
+    def __len__(self) -> int:
+        return -(-len(self.values) // self.block)
+
+    def __getitem__(self, key) -> np.ndarray:
+        if not isinstance(key, slice):  # elements at integer indices
+            samples = np.minimum(np.asarray(key)[..., None] * self.block + np.arange(self.block), len(self.values) - 1)
+            return self.ufunc.reduce(self.values[samples.ravel()].reshape(samples.shape), axis=-1)
+        assert key.step in (None, 1), 'only contiguous slices of a reduced level are supported'
+        start, stop, _ = key.indices(len(self))
+        y = self.values[start * self.block:stop * self.block]
+        return self.ufunc.reduceat(y, np.arange(0, len(y), self.block)) if len(y) else y
+
+
+class MinMaxPyramid:
+    """
+    Level-of-detail summary of a 1D signal: level 0 is the signal itself, level k keeps the min and max
+    of consecutive blocks of factor**k samples. It is built once in O(n) (~2/3 of the signal size for factor=4),
+    after that a min/max decimated view of any range costs O(screen pixels), independent of the recording length.
+    The min and max of a decimation bucket are placed at the samples where they occur, which are found by descending
+    the levels from the bucket down to the signal.
+    For an out-of-core signal (ChunkedArray) the levels finer than stored_block samples are reduced from the signal on access,
+    the first stored level is built in one streaming pass, so only ~2/stored_block of the signal size is kept in memory
+    """
+
+    def __init__(self, values: np.ndarray, factor: int = 4, min_level_size: int = 1024, stored_block: int = 64):
+        assert factor >= 2, 'factor of the pyramid should be at least 2'
+        self.factor = factor
+        self.size = len(values)
+        self.mins = [values]
+        self.maxs = [values]
+        if isinstance(values, ChunkedArray):
+            self._stream(values, min_level_size, stored_block)
+        while len(self.mins[-1]) > min_level_size:
+            starts = np.arange(0, len(self.mins[-1]), self.factor)
+            self.mins.append(np.minimum.reduceat(self.mins[-1], starts))
+            self.maxs.append(np.maximum.reduceat(self.maxs[-1], starts))
+
+    def _stream(self, values: ChunkedArray, min_level_size: int, stored_block: int):
+        while len(self.mins[-1]) > min_level_size:
+            block = self.block_size(self.nlevels)
+            if block < stored_block:
+                self.mins.append(_ReducedLevel(values, block, np.minimum))
+                self.maxs.append(_ReducedLevel(values, block, np.maximum))
+                continue
+            mins, maxs = [], []
+            for _, y in values.blocks(multiple=block):
+                starts = np.arange(0, len(y), block)
+                mins.append(np.minimum.reduceat(y, starts))
+                maxs.append(np.maximum.reduceat(y, starts))
+            self.mins.append(np.concatenate(mins))
+            self.maxs.append(np.concatenate(maxs))
+            return
+
+    @property
+    def nlevels(self) -> int:
+        return len(self.mins)
+
+    def block_size(self, level: int) -> int:
+        """number of signal samples summarized by one element of the level"""
+        return self.factor ** level
+
+    def level_for(self, ds: int) -> int:
+        """the coarsest level which still has at least one element per decimation bucket of ds samples"""
+        level = 0
+        while level + 1 < self.nlevels and self.block_size(level + 1) <= ds:
+            level += 1
+        return level
+
+    def range_minmax(self, start: int, stop: int) -> Tuple[float, float]:
+        """
+        min and max of samples [start, stop) in O(factor * nlevels): like a segment tree, only the partial blocks
+        at both ends of the range are reduced on each level, the rest is taken from the next coarser level
+        """
+        start, stop = max(0, start), min(stop, self.size)
+        assert start < stop, 'empty range'
+        mn, mx = np.inf, -np.inf
+        for level in range(self.nlevels):
+            if level + 1 == self.nlevels or stop - start <= 2 * self.factor:
+                return min(mn, self.mins[level][start:stop].min()), max(mx, self.maxs[level][start:stop].max())
+            up_start, up_stop = -(-start // self.factor), stop // self.factor
+            if up_start >= up_stop:  # no complete block of the next level within the range
+                return min(mn, self.mins[level][start:stop].min()), max(mx, self.maxs[level][start:stop].max())
+            for lo, hi in ((start, up_start * self.factor), (up_stop * self.factor, stop)):
+                if lo < hi:
+                    mn, mx = min(mn, self.mins[level][lo:hi].min()), max(mx, self.maxs[level][lo:hi].max())
+            start, stop = up_start, up_stop
+        return mn, mx
+
+    def bucket_geometry(self, ds: int) -> Tuple[int, int, int]:
+        """
+        :return: level to reduce, number of level elements per bucket and number of signal samples per bucket for decimation factor ds
+        """
+        level = self.level_for(ds)
+        per_bucket = max(1, ds // self.block_size(level))
+        return level, per_bucket, per_bucket * self.block_size(level)
+
+    def bucket_range(self, start: int, stop: int, bucket: int) -> Tuple[int, int]:
+        """[first, last) indices of the buckets covering samples [start, stop)"""
+        return max(0, start) // bucket, min(-(-stop // bucket), -(-self.size // bucket))
+
+    def _bucket_arg(self, level: int, per_bucket: int, lo: int, hi: int, valley: bool) -> np.ndarray:
+        """indices of the min (valley=True) or max element of each bucket of per_bucket elements of the level in [lo, hi)"""
+        y = (self.mins if valley else self.maxs)[level][lo:hi]
+        pad = -len(y) % per_bucket
+        if pad:  # the last bucket of the signal is incomplete
+            y = np.pad(y, (0, pad), mode='edge')
+        arg = np.argmin if valley else np.argmax
+        return lo + np.arange(len(y) // per_bucket) * per_bucket + arg(y.reshape(-1, per_bucket), axis=1)
+
+    def _descend(self, level: int, idx: np.ndarray, valley: bool) -> np.ndarray:
+        """sample indices where the min (valley=True) or max of the elements idx of the level occur"""
+        levels, arg = (self.mins, np.argmin) if valley else (self.maxs, np.argmax)
+        for lvl in range(level, 0, -1):
+            children = np.minimum(idx[:, None] * self.factor + np.arange(self.factor), len(levels[lvl - 1]) - 1)
+            pick = arg(levels[lvl - 1][children.ravel()].reshape(children.shape), axis=1)
+            idx = children[np.arange(idx.size), pick]
+        return idx
+
+    def reduce(self, level: int, per_bucket: int, first: int, last: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        min and max of buckets [first, last), each made of per_bucket elements of the level
+        :return: x - sample indices where the min and max of each bucket occur, y - their values; two points per bucket in time order
+        """
+        if last <= first:
+            return np.array([], dtype=np.int64), np.array([], dtype=self.mins[level].dtype)
+        lo, hi = first * per_bucket, min(last * per_bucket, len(self.mins[level]))
+        i_min = self._descend(level, self._bucket_arg(level, per_bucket, lo, hi, valley=True), valley=True)
+        i_max = self._descend(level, self._bucket_arg(level, per_bucket, lo, hi, valley=False), valley=False)
+        x = np.empty(2 * i_min.size, dtype=np.int64)
+        x[0::2], x[1::2] = np.minimum(i_min, i_max), np.maximum(i_min, i_max)
+        return x, self.mins[0][x]
+
+    def decimate(self, start: int, stop: int, ds: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        min/max decimation of samples [start, stop) into buckets of ~ds samples.
+        Buckets are aligned to multiples of the bucket size, so the same sample always lands in the same bucket
+        :return: x - sample indices of the min and max of each bucket, y - their values
+        """
+        level, per_bucket, bucket = self.bucket_geometry(ds)
+        first, last = self.bucket_range(start, stop, bucket)
+        return self.reduce(level, per_bucket, first, last)
+
+
+def reduce_to_columns(x: np.ndarray, y: np.ndarray, start: int, stop: int, ds: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    min and max of the points (x - sorted sample indices, y) within samples [start, stop) per pixel column
+    of ds samples (may be fractional) counted from start
+    :return: x, y of the min and max of every non-empty column, two points per column in time order
+    """
+    inside = slice(np.searchsorted(x, start), np.searchsorted(x, stop))
+    x, y = x[inside], y[inside]
+    if not x.size:
+        return x, y
+    col = ((x - start) / ds).astype(np.int64)
+    groups = np.flatnonzero(np.r_[True, col[1:] != col[:-1]])
+    counts = np.diff(np.r_[groups, x.size])
+    order = np.arange(x.size)
+    # the first point of each column which equals the column min (max)
+    i_min = np.minimum.reduceat(np.where(y == np.repeat(np.minimum.reduceat(y, groups), counts), order, x.size), groups)
+    i_max = np.minimum.reduceat(np.where(y == np.repeat(np.maximum.reduceat(y, groups), counts), order, x.size), groups)
+    keep = np.empty(2 * groups.size, dtype=np.int64)
+    keep[0::2], keep[1::2] = np.minimum(i_min, i_max), np.maximum(i_min, i_max)
+    return x[keep], y[keep]
+
+
+class DecimationCache:
+    """
+    Keeps the last decimated window of a renderer. A window is decimated in two steps: first into fine buckets of
+    ~ds/subdivision samples, which are aligned as in MinMaxPyramid.decimate, then these are reduced to the pixel columns
+    of the window (see reduce_to_columns), so that each column shows the exact envelope of its samples up to a fine bucket
+    at its edges. After panning with the same decimation factor only the newly exposed fine buckets are reduced,
+    the rest are reused
+    """
+    subdivision = 8
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.pyramid, self.bucket = None, None
+        self.first, self.last = 0, 0
+        self.x, self.y = np.array([], dtype=np.int64), np.array([])
+
+    def decimate(self, pyramid: MinMaxPyramid, start: int, stop: int, ds: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        min/max decimation of samples [start, stop) into pixel columns of ds samples (may be fractional)
+        :return: x - sample indices of the min and max of each column, y - their values
+        """
+        level, per_bucket, bucket = pyramid.bucket_geometry(max(1, int(ds // self.subdivision)))
+        first, last = pyramid.bucket_range(start, stop, bucket)
+
+        same_key = self.pyramid is pyramid and self.bucket == bucket
+        if same_key and first < self.last and last > self.first:  # overlaps with the cached window
+            xs, ys = [], []
+            if first < self.first:
+                x, y = pyramid.reduce(level, per_bucket, first, self.first)
+                xs.append(x)
+                ys.append(y)
+            keep = slice(2 * (max(first, self.first) - self.first), 2 * (min(last, self.last) - self.first))
+            xs.append(self.x[keep])
+            ys.append(self.y[keep])
+            if last > self.last:
+                x, y = pyramid.reduce(level, per_bucket, self.last, last)
+                xs.append(x)
+                ys.append(y)
+            x, y = np.concatenate(xs), np.concatenate(ys)
+        else:
+            x, y = pyramid.reduce(level, per_bucket, first, last)
+
+        self.pyramid, self.bucket = pyramid, bucket
+        self.first, self.last = first, max(first, last)
+        self.x, self.y = x, y
+        return reduce_to_columns(x, y, start, stop, ds)
+
+
+class SortedSamples:
+    """
+    Sorted sample indices (e.g. annotations of one fiducial) stored as a list of sorted int blocks
+    with at most 2 * block_size elements each, plus the last element of every block.
+    Lookups bisect the block maxima and then one block, insert and remove copy one block only,
+    so editing costs the same in a 5-minute file and in a 24-hour recording with 100k+ beats
+    """
+    block_size = 1024
+
+    def __init__(self, idx: np.ndarray = np.array([], dtype=np.int64)):
+        idx = np.sort(np.asarray(idx, dtype=np.int64))
+        self.blocks = [idx[i:i + self.block_size] for i in range(0, idx.size, self.block_size)]
+        self.maxes = [int(b[-1]) for b in self.blocks]
+        self._len = idx.size
+        self._array = idx  # flat copy of all blocks, rebuilt on first use after an edit
+
+    def __len__(self) -> int:
+        return self._len
+
+    def to_array(self) -> np.ndarray:
+        """all indices as one sorted array; the same object is returned until the next edit"""
+        if self._array is None:
+            self._array = np.concatenate(self.blocks) if self.blocks else np.array([], dtype=np.int64)
+        return self._array
+
+    def insert(self, i: int):
+        i = int(i)
+        if not self.blocks:
+            self.blocks, self.maxes = [np.array([i], dtype=np.int64)], [i]
+        else:
+            k = min(bisect.bisect_left(self.maxes, i), len(self.blocks) - 1)
+            block = self.blocks[k]
+            block = np.insert(block, np.searchsorted(block, i, 'right'), i)
+            if block.size > 2 * self.block_size:
+                half = block.size // 2
+                self.blocks[k:k + 1] = [block[:half], block[half:]]
+                self.maxes[k:k + 1] = [int(block[half - 1]), int(block[-1])]
+            else:
+                self.blocks[k], self.maxes[k] = block, int(block[-1])
+        self._len += 1
+        self._array = None
+
+    def remove(self, i: int) -> bool:
+        """remove one occurrence of i, :return: False if i is not stored"""
+        i = int(i)
+        k = bisect.bisect_left(self.maxes, i)
+        if k == len(self.blocks):
+            return False
+        block = self.blocks[k]
+        pos = np.searchsorted(block, i, 'left')
+        if block[pos] != i:
+            return False
+        block = np.delete(block, pos)
+        if block.size == 0:
+            del self.blocks[k], self.maxes[k]
+        else:
+            self.blocks[k], self.maxes[k] = block, int(block[-1])
+        self._len -= 1
+        self._array = None
+        return True
+
+    def neighbours(self, i: int) -> Tuple[Optional[int], Optional[int]]:
+        """:return: largest index <= i and smallest index > i, None where there is no such index"""
+        k = bisect.bisect_right(self.maxes, i)
+        prev, nxt = (self.maxes[k - 1] if k > 0 else None), None
+        if k < len(self.blocks):
+            block = self.blocks[k]
+            pos = np.searchsorted(block, i, 'right')
+            nxt = int(block[pos])
+            if pos > 0:
+                prev = int(block[pos - 1])
+        return prev, nxt
+
+    def between(self, lo: int, hi: int) -> np.ndarray:
+        """:return: sorted indices in [lo, hi)"""
+        if hi <= lo or not self.blocks:
+            return np.array([], dtype=np.int64)
+        k0, k1 = bisect.bisect_left(self.maxes, lo), bisect.bisect_left(self.maxes, hi)
+        if self._array is None and k1 - k0 < 8:
+            chunk = np.concatenate(self.blocks[k0:k1 + 1]) if k0 < len(self.blocks) else np.array([], dtype=np.int64)
+        else:  # many blocks in view: the flat copy is cheaper
+            chunk = self.to_array()
+        return chunk[np.searchsorted(chunk, lo, 'left'):np.searchsorted(chunk, hi, 'left')]
+
+    def remove_between(self, lo: int, hi: int) -> int:
+        """remove all indices in [lo, hi), :return: number of removed indices"""
+        idx = self.to_array()
+        start, stop = np.searchsorted(idx, lo, 'left'), np.searchsorted(idx, hi, 'left')
+        if stop > start:
+            self.__init__(np.r_[idx[:start], idx[stop:]])
+        return int(max(stop - start, 0))
+
+
+class ExtremaIndex:
+    """
+    Sorted sample indices of the local maxima (or minima, valley=True) of a signal and their prominence.
+    Built once per signal in O(n), after that the most prominent extremum of any range is a bisect plus
+    a scan of the extrema inside the range.
+    An out-of-core signal (ChunkedArray) is scanned block by block, prominences are then evaluated within wlen samples
+    around each extremum, which is much longer than any window annotations are pinned within
+    """
+
+    def __init__(self, values: np.ndarray, valley: bool = False, wlen: int = 2 ** 17 + 1):
+        if isinstance(values, ChunkedArray):
+            self.idx, self.prominence = self._scan(values, valley, wlen)
+        else:
+            values = -values if valley else values
+            self.idx, _ = find_peaks(values)
+            self.prominence = peak_prominences(values, self.idx)[0]
+        self._order, self._rank = None, None  # extrema from the most to the least prominent and their position in that order
+
+    @staticmethod
+    def _scan(values: ChunkedArray, valley: bool, wlen: int) -> Tuple[np.ndarray, np.ndarray]:
+        """blocks overlap by half of wlen, so extrema and prominences are the same as of the whole signal with the same wlen"""
+        margin, step = wlen // 2, values.block_size
+        idx, prominence = [], []
+        for start in range(0, len(values), step):
+            lo = max(0, start - margin)
+            y = values[lo:start + step + margin]
+            y = -y if valley else y
+            peaks, _ = find_peaks(y)
+            peaks = peaks[(peaks >= start - lo) & (peaks < start + step - lo)]  # the rest belongs to the neighbouring blocks
+            idx.append(lo + peaks)
+            prominence.append(peak_prominences(y, peaks, wlen=wlen)[0])
+        return np.concatenate(idx or [np.array([], dtype=np.int64)]), np.concatenate(prominence or [np.array([])])
+
+    def __len__(self) -> int:
+        return self.idx.size
+
+    def most_prominent(self, start: int, stop: int) -> Optional[int]:
+        """:return: sample index of the most prominent extremum in [start, stop), None if there is none"""
+        lo, hi = np.searchsorted(self.idx, start, 'left'), np.searchsorted(self.idx, stop, 'left')
+        if lo >= hi:
+            return None
+        return int(self.idx[lo + np.argmax(self.prominence[lo:hi])])
+
+    def most_prominent_many(self, starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+        """vectorized most_prominent over the ranges [starts[i], stops[i]), -1 where a range has no extremum"""
+        if self._rank is None:
+            # ranks instead of prominences make the minimum unique, so it points back to one extremum
+            self._order = np.argsort(-self.prominence, kind='stable')
+            self._rank = np.empty(self._order.size + 1, dtype=np.int64)
+            self._rank[self._order] = np.arange(self._order.size)
+            self._rank[-1] = self._order.size  # sentinel, reduceat indices must be smaller than the array size
+        lo, hi = np.searchsorted(self.idx, starts, 'left'), np.searchsorted(self.idx, stops, 'left')
+        found = lo < hi
+        best = np.full(lo.size, -1, dtype=np.int64)
+        if found.any():
+            bounds = np.empty(2 * np.count_nonzero(found), dtype=np.int64)
+            bounds[0::2], bounds[1::2] = lo[found], hi[found]
+            rank = np.minimum.reduceat(self._rank, bounds)[0::2]
+            best[found] = self.idx[self._order[rank]]
+        return best
+
+
+class TimeAxis:
+    """
+    Time stamps offset + i / fs of a uniformly sampled signal of size samples, computed on access instead of stored.
+    Behaves as the sorted float array it replaces for indexing, len(), np.searchsorted() and np.asarray(),
+    but searching and time to sample conversion are O(1) and it takes no memory
+    """
+    ndim = 1
+    dtype = np.dtype(float)
+
+    def __init__(self, size: int, fs: float, offset: float = 0):
+        self.size = int(size)
+        self.fs = fs
+        self.offset = offset
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def shape(self) -> Tuple[int]:
+        return self.size,
+
+    def _at(self, i):
+        return self.offset + i / self.fs
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._at(np.arange(*key.indices(self.size)))
+        if np.ndim(key) == 0:
+            i = int(key)
+            if not -self.size <= i < self.size:
+                raise IndexError('index {} is out of bounds for a time axis of size {}'.format(key, self.size))
+            return float(self._at(i % self.size))
+        key = np.asarray(key)
+        i = np.flatnonzero(key) if key.dtype == bool else key.astype(np.int64)
+        if i.size and not (-self.size <= i.min() and i.max() < self.size):
+            raise IndexError('index out of bounds for a time axis of size {}'.format(self.size))
+        return self._at(i % self.size if self.size else i)
+
+    def __array__(self, dtype=None, copy=None):
+        return self._at(np.arange(self.size)).astype(dtype or float, copy=False)
+
+    def searchsorted(self, v, side='left', sorter=None):
+        """as np.searchsorted on the materialized time stamps: the index is computed and then corrected for rounding"""
+        v = np.asarray(v, dtype=float)
+        i = np.clip(np.nan_to_num(np.ceil((v - self.offset) * self.fs), nan=self.size), 0, self.size).astype(np.int64)
+        below = (lambda t: t >= v) if side == 'left' else (lambda t: t > v)  # i should be the first index not below v
+        i = i - ((i > 0) & below(self._at(i - 1)))
+        i = i + ((i < self.size) & ~below(self._at(i)))
+        return i[()]
+
+    def nearest(self, x):
+        """index of the sample closest to x (the earlier one on a tie), an array of indices if x is an array"""
+        x = np.asarray(x, dtype=float)
+        i = np.clip(np.ceil((x - self.offset) * self.fs - 0.5), 0, max(self.size - 1, 0)).astype(np.int64)
+        i = i + ((i + 1 < self.size) & (self._at(i + 1) - x < x - self._at(i)))
+        i = i - ((i > 0) & (x - self._at(i - 1) <= self._at(i) - x))
+        return int(i) if i.ndim == 0 else i
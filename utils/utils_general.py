@@ -2,7 +2,7 @@ import errno
 import os
 import pathlib
 import sys
-from typing import Tuple, Union
+from typing import Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
@@ -93,6 +93,20 @@ def string_to_path(string:Union[str,pathlib.Path])->pathlib.Path:
         raise TypeError
 
 
+def parse_time_window(string: str) -> Optional[Tuple[float, Optional[float]]]:
+    """'start-end' in seconds to (start, end), 'start-' to (start, None) until the end of the file, '' to None for the whole file"""
+    string = string.strip()
+    if not string:
+        return None
+    start, sep, end = string.partition('-')
+    if not sep:
+        raise ValueError('time window should be start-end in seconds, got {}'.format(string))
+    start, end = float(start), float(end) if end.strip() else None
+    if start < 0 or (end is not None and end <= start):
+        raise ValueError('time window should be start-end with 0 <= start < end, got {}'.format(string))
+    return start, end
+
+
 def butter_highpass(cutoff, fs, order=2):
     nyq = 0.5 * fs
     normal_cutoff = cutoff / nyq
@@ -142,51 +156,22 @@ def find_closest(input_array: np.ndarray, target_array: np.ndarray, tol: float =
       reject_indices:  the indices of elements in target_array that do not have a match in input_array within tolerance
     """
 
-    input_array_len = len(input_array)
+    input_array, target_array = np.asarray(input_array), np.asarray(target_array)
     closest_indices = np.searchsorted(input_array, target_array)  # determine the locations of target_array in input_array
-    acc_rej_indices = [-1] * len(target_array)
-    curr_tol = [tol] * len(target_array)
-
-    est_tol = 0.0
-    for i in range(len(target_array)):
-        best_off = 0  # used to adjust closest_indices[i] for best approximating element in input_array
-
-        if closest_indices[i] >= input_array_len:
-            # the value target_array[i] is >= all elements in input_array so check whether it is within tolerance of the last element
-            closest_indices[i] = input_array_len - 1
-            est_tol = target_array[i] - input_array[closest_indices[i]]
-            if est_tol < curr_tol[i]:
-                curr_tol[i] = est_tol
-                acc_rej_indices[i] = i
-        elif target_array[i] == input_array[closest_indices[i]]:
-            # target_array[i] is in input_array
-            est_tol = 0.0
-            curr_tol[i] = 0.0
-            acc_rej_indices[i] = i
-        elif closest_indices[i] == 0:
-            # target_array[i] is <= all elements in input_array
-            est_tol = input_array[0] - target_array[i]
-            if est_tol < curr_tol[i]:
-                curr_tol[i] = est_tol
-                acc_rej_indices[i] = i
-        else:
-            # target_array[i] is between input_array[closest_indices[i]-1] and input_array[closest_indices[i]]
-            # and closest_indices[i] must be > 0
-            top_tol = input_array[closest_indices[i]] - target_array[i]
-            bot_tol = target_array[i] - input_array[closest_indices[i] - 1]
-            if bot_tol <= top_tol:
-                est_tol = bot_tol
-                best_off = -1  # this is the only place where best_off != 0
-            else:
-                est_tol = top_tol
-
-            if est_tol < curr_tol[i]:
-                curr_tol[i] = est_tol
-                acc_rej_indices[i] = i
-
-        if est_tol <= tol:
-            closest_indices[i] += best_off
-
-    accept_indices = np.compress(np.greater(acc_rej_indices, -1), acc_rej_indices)
-    reject_indices = np.compress(np.equal(acc_rej_indices, -1), np.arange(len(acc_rej_indices)))
+    above = closest_indices >= len(input_array)  # target_array[i] is >= all elements in input_array
+    top = np.minimum(closest_indices, len(input_array) - 1)
+    bottom = np.maximum(closest_indices - 1, 0)
+    top_tol = input_array[top] - target_array
+    bot_tol = target_array - input_array[bottom]
+    exact = ~above & (top_tol == 0)  # target_array[i] is in input_array
+    # between input_array[closest_indices[i]-1] and input_array[closest_indices[i]], the lower one wins a tie
+    use_bottom = ~above & ~exact & (closest_indices > 0) & (bot_tol <= top_tol)
+
+    est_tol = np.where(above | use_bottom, bot_tol, top_tol)
+    est_tol[exact] = 0.0
+    closest_indices = top - (use_bottom & (est_tol <= tol))  # out of tolerance matches keep the upper neighbour
+
+    accepted = exact | (est_tol < tol)
+    accept_indices = np.flatnonzero(accepted)
+    reject_indices = np.flatnonzero(~accepted)
     return closest_indices, accept_indices, reject_indices